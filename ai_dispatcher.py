@@ -0,0 +1,171 @@
+import asyncio
+import json
+import aiohttp  # For asynchronous HTTP requests
+from chat_scheduler import ChatScheduler
+from metrics import timed
+
+
+class AIDispatcher:
+    """Pooled, non-blocking client for the Suzu text generation API.
+
+    With `batch_size` above 1, prompts that arrive within `batch_window`
+    seconds of each other are sent to `batch_url` as one multi-question
+    request and the replies are handed back to each caller.
+    """
+
+    def __init__(self, api_url, scheduler=None, cache=None, workers=3, timeout=15, max_connections=10,
+                 batch_url=None, batch_size=1, batch_window=0.3, stream_url=None):
+        self.api_url = api_url
+        self.stream_url = stream_url or api_url.rstrip("/") + "/stream"
+        self.batch_url = batch_url or api_url.rstrip("/") + "/batch"
+        self.batch_size = batch_size  # Most questions per batched request, 1 turns batching off
+        self.batch_window = batch_window  # Seconds to wait for more questions before sending a batch
+        # Batches only fill up if enough workers are waiting on replies at once
+        self.worker_count = max(workers, batch_size)  # Number of requests that can be in flight at once
+        self.timeout = aiohttp.ClientTimeout(total=timeout)  # Per-request timeout
+        self.stream_timeout = aiohttp.ClientTimeout(total=None, sock_read=timeout)  # Streams only time out when they stall
+        self.max_connections = max_connections  # Size of the keep-alive connection pool
+        self.scheduler = scheduler or ChatScheduler()  # Requests waiting for a worker
+        self.cache = cache  # Optional ResponseCache in front of the API
+        self.session = None  # Shared HTTP session, created in start()
+        self.workers = []  # Worker tasks draining the queue
+        self.handler = None  # Coroutine called for every queued request
+
+        self._batch = []  # (text, future) pairs waiting for the next batch
+        self._batch_timer = None
+        self._batch_tasks = set()  # Batches currently being sent
+
+    async def start(self, handler):
+        """Open the shared HTTP session and start the worker pool."""
+        self.handler = handler
+
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+        if not self.workers:
+            self.workers = [asyncio.create_task(self._worker(i)) for i in range(self.worker_count)]
+            print(f"🧠 AI dispatcher started with {self.worker_count} workers")
+
+    async def stop(self):
+        """Cancel the workers and close the HTTP session."""
+        for task in self.workers + list(self._batch_tasks):
+            task.cancel()
+        await asyncio.gather(*self.workers, *self._batch_tasks, return_exceptions=True)
+        self.workers = []
+
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def generate(self, text, url=None):
+        """Send a prompt to the AI API and return the reply text."""
+        if url is not None:
+            response, _ = await self._fetch(text, url)
+            return response
+
+        fetch = self._fetch_batched if self.batch_size > 1 else self._fetch
+        if self.cache is not None:
+            return await self.cache.get_or_fetch(text, lambda: fetch(text))
+        response, _ = await fetch(text)
+        return response
+
+    async def stream(self, text):
+        """Yield the reply text piece by piece while the API is still generating it."""
+        if self.cache is not None:
+            cached = self.cache.lookup(text)
+            if cached is not None:
+                yield cached
+                return
+
+        pieces = []
+        fallback = False
+        async with self.session.post(self.stream_url, json={"text": text}, timeout=self.stream_timeout) as response:
+            response.raise_for_status()
+
+            # Server-sent events: "data:" lines carry text, a final "end" event reports fallback replies
+            event = "message"
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").rstrip("\r\n")
+                if not line:
+                    event = "message"
+                elif line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[len("data:"):])
+                    if event == "end":
+                        fallback = data.get("fallback", False)
+                    else:
+                        pieces.append(data["text"])
+                        yield data["text"]
+
+        if self.cache is not None and pieces and not fallback:
+            self.cache.set(text, "".join(pieces).strip())
+
+    @timed("ai_api_seconds", "Suzu API request latency")
+    async def _fetch(self, text, url=None):
+        """POST a prompt to the API. Returns (reply, cacheable)."""
+        async with self.session.post(url or self.api_url, json={"text": text}) as response:
+            response.raise_for_status()
+            data = await response.json()
+        # The API flags its canned "having trouble" replies so they never get cached
+        return data.get("response", "I'm not sure how to respond to that!"), not data.get("fallback")
+
+    async def _fetch_batched(self, text):
+        """Add a prompt to the current batch and wait for its reply. Returns (reply, cacheable)."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._batch.append((text, future))
+
+        if len(self._batch) >= self.batch_size:
+            self._flush_batch()
+        elif self._batch_timer is None:
+            self._batch_timer = loop.call_later(self.batch_window, self._flush_batch)
+
+        return await future
+
+    def _flush_batch(self):
+        """Send whatever is in the current batch."""
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+
+        batch, self._batch = self._batch, []
+        if batch:
+            task = asyncio.create_task(self._send_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _send_batch(self, batch):
+        """POST a batch of prompts and resolve each caller's future with its reply."""
+        try:
+            if len(batch) == 1:
+                results = [await self._fetch(batch[0][0])]
+            else:
+                async with self.session.post(self.batch_url, json={"texts": [text for text, _ in batch]}) as response:
+                    response.raise_for_status()
+                    data = await response.json()
+                replies = data.get("responses") or []
+                if len(replies) != len(batch):
+                    raise ValueError(f"Batch returned {len(replies)} replies for {len(batch)} questions")
+                results = [(reply, not data.get("fallback")) for reply in replies]
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _worker(self, worker_id):
+        """Take requests from the scheduler and hand them to the handler, one at a time."""
+        while True:
+            request = await self.scheduler.get()
+            try:
+                await self.handler(*request.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ AI worker {worker_id} failed: {e}")
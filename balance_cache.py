@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from db_connections import per_database
+from metrics import registry as metrics
+
+# Columns of a user's row that the games read on almost every command
+PROFILE_COLUMNS = ("chips", "level", "xp", "strength", "dexterity", "intelligence", "vitality", "hp", "max_hp", "inventory")
+
+
+class BalanceCache:
+    """Write-through LRU cache of users' chips and RPG profile, shared by blackjack and the RPG.
+
+    Every write path either updates the cached fields with the value it just
+    wrote or drops the entry, so the two games never see stale chip counts.
+    The TTL bounds staleness from writes made by other processes.
+    """
+
+    def __init__(self, max_entries=5000, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl  # Seconds before an entry is re-read from disk
+        self.entries = OrderedDict()  # Username -> (expires_at, profile dict), least recently used first
+        self.columns = None  # PROFILE_COLUMNS present in this database, the RPG ones may be missing
+        self._lock = threading.Lock()
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username):
+        """A copy of the cached profile, or None."""
+        with self._lock:
+            entry = self.entries.get(username)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            self.entries.move_to_end(username)
+            return dict(entry[1])
+
+    def put(self, username, profile):
+        with self._lock:
+            self.entries[username] = (time.monotonic() + self.ttl, dict(profile))
+            self.entries.move_to_end(username)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def update(self, username, **fields):
+        """Write-through: set fields on a cached profile. Users that aren't cached are left alone."""
+        with self._lock:
+            entry = self.entries.get(username)
+            if entry is not None:
+                entry[1].update(fields)
+
+    def invalidate(self, username):
+        with self._lock:
+            self.entries.pop(username, None)
+
+    def fetch(self, conn, username):
+        """The user's profile from the cache, or read through `conn`. None if the user doesn't exist."""
+        profile = self.get(username)
+        if profile is not None:
+            self.hits += 1
+            return profile
+
+        self.misses += 1
+        if self.columns is None:
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+            self.columns = [column for column in PROFILE_COLUMNS if column in existing]
+        row = conn.execute(f"SELECT {', '.join(self.columns)} FROM users WHERE username = ?", (username,)).fetchone()
+        if row is None:
+            return None
+        profile = dict(zip(self.columns, row))
+        self.put(username, profile)
+        return profile
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Blackjack and the RPG must see the same balances, so both get this cache
+get_balance_cache = per_database(lambda db_path: BalanceCache())
+
+
+def _cache_samples():
+    caches = get_balance_cache.items()
+    return [
+        ({"database": os.path.basename(path), "result": result}, cache.stats()[result])
+        for path, cache in caches
+        for result in ("hits", "misses")
+    ]
+
+
+metrics.gauge("balance_cache_lookups", "Balance cache lookups, by result").add_callback(_cache_samples)
@@ -0,0 +1,488 @@
+"""Offline load benchmark for the Twitch bot.
+
+Feeds synthetic (or recorded) chat through Bot.event_message and the command
+handlers using stand-in Twitch objects, a stub AI server with configurable
+latency and a throwaway copy of the database, then reports throughput, reply
+latency percentiles, dropped requests and event loop lag.
+
+    python bench_twitch_bot.py --rate 50 --duration 20
+    python bench_twitch_bot.py --replay chat.jsonl --json
+    python bench_twitch_bot.py --max-p95 500 --max-drop-rate 0.01   # exits 1 on regressions, for CI
+
+Replay files hold one JSON object per line:
+    {"t": 0.5, "channel": "somechannel", "user": "viewer1", "content": "hey suzu hi!", "mod": false, "sub": true}
+"""
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+from aiohttp import web
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MIX = "ai=0.4,blackjack=0.3,rpg=0.15,economy=0.15"
+
+# (message id, phase) of the chat message being handled, so replies can be matched to it
+current_message = contextvars.ContextVar("current_message", default=None)
+
+
+# Stand-ins for the twitchio objects the bot touches
+class FakeChatter:
+    def __init__(self, name, is_mod=False, is_subscriber=False, is_broadcaster=False):
+        self.name = name
+        self.display_name = name
+        self.is_mod = is_mod
+        self.is_subscriber = is_subscriber
+        self.is_broadcaster = is_broadcaster
+        self.is_vip = False
+        self.badges = {}
+        self._ws = None
+
+
+class FakeChannel:
+    def __init__(self, name, recorder):
+        self.name = name
+        self.recorder = recorder
+
+    async def send(self, content):
+        self.recorder.reply(self.name, content)
+
+
+class FakeMessage:
+    def __init__(self, message_id, content, author, channel):
+        self.id = message_id
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.tags = {}
+        self.echo = False
+        self.timestamp = time.time()
+
+
+class Recorder:
+    """Matches every message the bot sends to the chat message that caused it."""
+
+    def __init__(self):
+        self.kinds = {}  # Message id -> workload kind
+        self.sent_at = {}  # Message id -> time it was handed to the bot
+        self.first_reply = {}  # Message id -> (seconds until first reply, phase)
+        self.handled = 0  # event_message calls that returned
+        self.errors = 0  # event_message calls that raised
+        self.replies = 0
+        self.unmatched = 0  # Replies sent outside any message's context
+
+    def sent(self, message_id, kind):
+        self.kinds[message_id] = kind
+        self.sent_at[message_id] = time.perf_counter()
+
+    def reply(self, channel, content):
+        self.replies += 1
+        current = current_message.get()
+        if current is None:
+            self.unmatched += 1
+            return
+        message_ids, phase = current
+        self.matched(message_ids if isinstance(message_ids, list) else [message_ids], phase)
+
+    def matched(self, message_ids, phase):
+        """Count the messages as replied to, if they weren't already."""
+        for message_id in message_ids:
+            if message_id not in self.first_reply:
+                self.first_reply[message_id] = (time.perf_counter() - self.sent_at[message_id], phase)
+
+    def waiting_for_ai(self):
+        """AI questions that have had no reply of any kind yet."""
+        return sum(1 for message_id, kind in self.kinds.items() if kind == "ai" and message_id not in self.first_reply)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list, 0.0 for an empty one."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def latency_summary(seconds):
+    return {
+        "count": len(seconds),
+        "p50_ms": percentile(seconds, 50) * 1000,
+        "p95_ms": percentile(seconds, 95) * 1000,
+        "p99_ms": percentile(seconds, 99) * 1000,
+        "max_ms": max(seconds, default=0.0) * 1000,
+    }
+
+
+def parse_mix(text):
+    """Parse 'ai=0.4,blackjack=0.3' into a dict of weights."""
+    mix = {}
+    for part in text.split(","):
+        if part.strip():
+            kind, _, weight = part.partition("=")
+            mix[kind.strip()] = float(weight or 1)
+    unknown = set(mix) - {"ai", "blackjack", "rpg", "economy"}
+    if unknown:
+        raise ValueError(f"Unknown workload kinds: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def kind_of(content):
+    """Workload kind of a recorded chat line."""
+    text = content.lower()
+    if text.startswith("hey suzu"):
+        return "ai"
+    command = text[1:].split(" ", 1)[0] if text.startswith("~") else ""
+    if command in ("blackjack", "bet", "deal", "hit", "stand", "dealer", "double", "insurance"):
+        return "blackjack"
+    if command in ("rpgstats", "gainxp", "buy", "use", "roll", "xp", "spawnmonster", "joinbattle",
+                   "attack", "monsterattack", "startbattle"):
+        return "rpg"
+    if command:
+        return "economy"
+    return "chat"
+
+
+def synthetic_messages(args):
+    """Yield (offset, channel, user, content, is_mod, is_sub) with Poisson arrivals at args.rate."""
+    rng = random.Random(args.seed)
+    channels = [f"bench{i}" for i in range(args.channels)]
+    users = [f"viewer{i}" for i in range(args.users)]
+    mods = set(rng.sample(users, int(len(users) * args.mod_ratio)))
+    subs = set(rng.sample(users, int(len(users) * args.sub_ratio)))
+    mix = parse_mix(args.mix)
+    kinds, weights = list(mix), list(mix.values())
+
+    # Each channel loops through a scripted blackjack round
+    rounds = {channel: [] for channel in channels}
+
+    def next_round(channel):
+        players = rng.sample(users, min(len(users), rng.randint(1, 4)))
+        script = [("~blackjack", rng.choice(users))]
+        script += [(f"~bet {rng.choice((10, 25, 50))}", player) for player in players]
+        script.append(("~deal", rng.choice(users)))
+        for player in players:
+            script += [("~hit", player)] * rng.randint(0, 2) + [("~stand", player)]
+        script.append(("~dealer", rng.choice(users)))
+        rounds[channel] = script
+
+    rpg_commands = ["~roll 2d6", "~roll 1d20", "~xp", "~gainxp 5", "~spawnmonster", "~joinbattle", "~use potion"]
+    economy_commands = ["~balance", "~stats", "~leaderboard", "~daily", "~help", "~give viewer0 1"]
+
+    offset = 0.0
+    while offset < args.duration:
+        offset += rng.expovariate(args.rate)
+        channel = rng.choice(channels)
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "ai":
+            user = rng.choice(users)
+            content = f"hey suzu what do you think about topic {rng.randrange(args.ai_topics)}?"
+        elif kind == "blackjack":
+            if not rounds[channel]:
+                next_round(channel)
+            content, user = rounds[channel].pop(0)
+        elif kind == "rpg":
+            user, content = rng.choice(users), rng.choice(rpg_commands)
+        else:
+            user, content = rng.choice(users), rng.choice(economy_commands)
+        yield offset, channel, user, content, user in mods, user in subs
+
+
+def replay_messages(path):
+    """Yield recorded chat lines in the same shape as synthetic_messages."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                yield (float(entry["t"]), entry.get("channel", "bench0").lower(), entry["user"].lower(),
+                       entry["content"], entry.get("mod", False), entry.get("sub", False))
+
+
+async def start_stub_ai(latency, jitter, rng):
+    """Serve the three Suzu generate endpoints locally with a fake reply after `latency` seconds."""
+
+    def delay():
+        return max(0.0, latency + rng.uniform(-jitter, jitter))
+
+    async def generate(request):
+        data = await request.json()
+        await asyncio.sleep(delay())
+        return web.json_response({"response": f"Suzu thinks: {data['text']}"})
+
+    async def generate_batch(request):
+        data = await request.json()
+        await asyncio.sleep(delay())
+        return web.json_response({"responses": [f"Suzu thinks: {text}" for text in data["texts"]]})
+
+    async def generate_stream(request):
+        data = await request.json()
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        words = f"Suzu thinks: {data['text']}".split()
+        for word in words:
+            await asyncio.sleep(delay() / len(words))
+            await response.write(f"data: {json.dumps({'text': word + ' '})}\n\n".encode("utf-8"))
+        await response.write(b'event: end\ndata: {"fallback": false}\n\n')
+        return response
+
+    app = web.Application()
+    app.router.add_post("/twitchgenerate", generate)
+    app.router.add_post("/twitchgenerate/batch", generate_batch)
+    app.router.add_post("/twitchgenerate/stream", generate_stream)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}/twitchgenerate"
+
+
+async def probe_loop_lag(interval, samples):
+    """Record how late the event loop wakes up a sleeper, a direct measure of blocking."""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - started - interval))
+
+
+async def run_benchmark(args, bot_module):
+    from chat_sender import ChatSender
+
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    stub_runner, stub_url = await start_stub_ai(args.ai_latency, args.ai_jitter, rng)
+
+    messages = list(replay_messages(args.replay) if args.replay else synthetic_messages(args))
+    channel_names = sorted({entry[1] for entry in messages}) or ["bench0"]
+    channels = {name: FakeChannel(name, recorder) for name in channel_names}
+
+    bot = bot_module.Bot(channel_names)
+    bot._http.nick = "suzu_bench"
+    bot.is_active = True
+    bot.stream_replies = args.stream
+    bot.chat_sender = ChatSender(args.account_type)
+    bot.ai_dispatcher.api_url = stub_url
+    bot.ai_dispatcher.stream_url = stub_url + "/stream"
+    bot.ai_dispatcher.batch_url = stub_url + "/batch"
+    bot.ai_dispatcher.batch_size = args.batch_size
+    bot.ai_dispatcher.worker_count = max(args.ai_workers, args.batch_size)
+
+    # Replies sent while shedding or answering belong to the queued messages, not whatever is running
+    say_shed_notices = bot.say_shed_notices
+
+    async def shed_notices(channel, notices):
+        message_ids = [request.payload[0].id for _, request in notices]
+        token = current_message.set((message_ids, "shed"))
+        try:
+            await say_shed_notices(channel, notices)
+            # Notices skipped because chat was backed up still count as rejected, not unanswered
+            recorder.matched(message_ids, "shed")
+        finally:
+            current_message.reset(token)
+
+    async def process_request(message, user_message):
+        token = current_message.set((message.id, "answer"))
+        try:
+            await bot.process_request(message, user_message)
+        finally:
+            current_message.reset(token)
+
+    bot.say_shed_notices = shed_notices
+    await bot.ai_dispatcher.start(process_request)
+
+    async def handle(message, kind):
+        current_message.set((message.id, "handle"))
+        recorder.sent(message.id, kind)
+        try:
+            await bot.event_message(message)
+            recorder.handled += 1
+        except Exception as e:
+            recorder.errors += 1
+            print(f"⚠️ Benchmark message failed: {e}")
+
+    lag_samples = []
+    lag_task = asyncio.create_task(probe_loop_lag(args.lag_interval, lag_samples))
+    tasks = []
+    started = time.perf_counter()
+    for message_id, (offset, channel, user, content, is_mod, is_sub) in enumerate(messages):
+        wait = started + offset - time.perf_counter()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        author = FakeChatter(user, is_mod=is_mod, is_subscriber=is_sub, is_broadcaster=user == channel)
+        message = FakeMessage(message_id, content, author, channels[channel])
+        # twitchio runs every event_message in its own task, so do the same
+        tasks.append(asyncio.create_task(handle(message, kind_of(content)), context=contextvars.copy_context()))
+    injected = time.perf_counter() - started
+
+    await asyncio.gather(*tasks)
+    deadline = time.perf_counter() + args.drain
+    while recorder.waiting_for_ai() and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+
+    lag_task.cancel()
+    await bot.ai_dispatcher.stop()
+    await stub_runner.cleanup()
+
+    return build_report(args, bot, recorder, lag_samples, len(messages), injected, elapsed)
+
+
+def build_report(args, bot, recorder, lag_samples, total, injected, elapsed):
+    latencies = defaultdict(list)
+    ai_outcomes = Counter()
+    for message_id, kind in recorder.kinds.items():
+        reply = recorder.first_reply.get(message_id)
+        if kind == "ai":
+            if reply is None:
+                ai_outcomes["unanswered"] += 1
+                continue
+            _, phase = reply
+            ai_outcomes["answered" if phase == "answer" else "rejected"] += 1
+            if phase != "answer":
+                continue
+        if reply is not None:
+            latencies[kind].append(reply[0])
+    everything = [seconds for values in latencies.values() for seconds in values]
+
+    shed = Counter()
+    for stats in bot.ai_scheduler.stats().values():
+        shed.update(stats["shed"])
+
+    asked = sum(ai_outcomes.values())
+    dropped = ai_outcomes["unanswered"] + sum(shed.values())
+    return {
+        "messages": total,
+        "offered_rate": total / injected if injected else 0.0,
+        "elapsed_s": elapsed,
+        "throughput": recorder.handled / elapsed if elapsed else 0.0,
+        "replies": recorder.replies,
+        "errors": recorder.errors,
+        "latency": latency_summary(everything),
+        "latency_by_kind": {kind: latency_summary(values) for kind, values in sorted(latencies.items())},
+        "ai": dict(ai_outcomes, asked=asked),
+        "shed": dict(+shed),  # Only the reasons that actually happened
+        "dropped": dropped,
+        "drop_rate": dropped / asked if asked else 0.0,
+        "loop_lag": {
+            "p50_ms": percentile(lag_samples, 50) * 1000,
+            "p99_ms": percentile(lag_samples, 99) * 1000,
+            "max_ms": max(lag_samples, default=0.0) * 1000,
+        },
+        "cache": bot.ai_cache.stats(),
+    }
+
+
+def print_report(report):
+    print(f"📊 {report['messages']} messages at {report['offered_rate']:.1f} msg/s, "
+          f"handled {report['throughput']:.1f} msg/s over {report['elapsed_s']:.1f}s")
+    print(f"   Replies: {report['replies']} | Errors: {report['errors']}")
+    rows = [("all", report["latency"])] + list(report["latency_by_kind"].items())
+    for kind, summary in rows:
+        print(f"   {kind:<10} n={summary['count']:<6} p50={summary['p50_ms']:8.1f}ms  p95={summary['p95_ms']:8.1f}ms  "
+              f"p99={summary['p99_ms']:8.1f}ms  max={summary['max_ms']:8.1f}ms")
+    ai = report["ai"]
+    print(f"   AI: {ai.get('asked', 0)} asked, {ai.get('answered', 0)} answered, {ai.get('rejected', 0)} rejected, "
+          f"{ai.get('unanswered', 0)} unanswered | Shed: {report['shed'] or 'none'} | Drop rate: {report['drop_rate']:.1%}")
+    lag = report["loop_lag"]
+    print(f"   Event loop lag: p50={lag['p50_ms']:.1f}ms  p99={lag['p99_ms']:.1f}ms  max={lag['max_ms']:.1f}ms")
+    cache = report["cache"]
+    print(f"   Cache: {cache['hit_rate']:.0%} hits, {cache['coalesce_rate']:.0%} coalesced, {cache['misses']} misses")
+
+
+def check_thresholds(args, report):
+    """Return a list of threshold failures, empty when the run is within limits."""
+    failures = []
+    if args.max_p95 is not None and report["latency"]["p95_ms"] > args.max_p95:
+        failures.append(f"p95 latency {report['latency']['p95_ms']:.1f}ms > {args.max_p95}ms")
+    if args.max_p99 is not None and report["latency"]["p99_ms"] > args.max_p99:
+        failures.append(f"p99 latency {report['latency']['p99_ms']:.1f}ms > {args.max_p99}ms")
+    if args.max_drop_rate is not None and report["drop_rate"] > args.max_drop_rate:
+        failures.append(f"drop rate {report['drop_rate']:.2%} > {args.max_drop_rate:.2%}")
+    if args.max_loop_lag is not None and report["loop_lag"]["p99_ms"] > args.max_loop_lag:
+        failures.append(f"p99 event loop lag {report['loop_lag']['p99_ms']:.1f}ms > {args.max_loop_lag}ms")
+    if args.max_errors is not None and report["errors"] > args.max_errors:
+        failures.append(f"{report['errors']} errors > {args.max_errors}")
+    return failures
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline chat load benchmark for the Suzu Twitch bot")
+    workload = parser.add_argument_group("workload")
+    workload.add_argument("--rate", type=float, default=20, help="Chat messages per second")
+    workload.add_argument("--duration", type=float, default=15, help="Seconds of synthetic chat")
+    workload.add_argument("--channels", type=int, default=1, help="Number of channels")
+    workload.add_argument("--users", type=int, default=300, help="Distinct chatters")
+    workload.add_argument("--mix", default=DEFAULT_MIX, help="Workload weights, kinds: ai, blackjack, rpg, economy")
+    workload.add_argument("--ai-topics", type=int, default=10000, help="Distinct AI questions, fewer means more cache hits")
+    workload.add_argument("--mod-ratio", type=float, default=0.02)
+    workload.add_argument("--sub-ratio", type=float, default=0.2)
+    workload.add_argument("--replay", help="Replay a JSONL chat recording instead of synthetic chat")
+    workload.add_argument("--seed", type=int, default=1)
+
+    stubs = parser.add_argument_group("stubs and bot settings")
+    stubs.add_argument("--ai-latency", type=float, default=0.5, help="Seconds the stub AI takes per reply")
+    stubs.add_argument("--ai-jitter", type=float, default=0.2, help="Random +/- seconds added to the AI latency")
+    stubs.add_argument("--ai-workers", type=int, default=3)
+    stubs.add_argument("--batch-size", type=int, default=1)
+    stubs.add_argument("--stream", action="store_true", help="Stream AI replies into chat")
+    stubs.add_argument("--account-type", default="verified", help="Chat rate limit to apply: normal, moderator or verified")
+    stubs.add_argument("--db", default=os.path.join(REPO_DIR, "blackjack.db"), help="Database to copy for the run")
+    stubs.add_argument("--drain", type=float, default=30, help="Seconds to wait for outstanding AI replies")
+    stubs.add_argument("--lag-interval", type=float, default=0.01, help="Event loop probe interval in seconds")
+
+    output = parser.add_argument_group("output and CI thresholds")
+    output.add_argument("--json", action="store_true", help="Print the report as JSON")
+    output.add_argument("--verbose", action="store_true", help="Show the bot's own log output")
+    output.add_argument("--max-p95", type=float, help="Fail if overall p95 reply latency exceeds this many ms")
+    output.add_argument("--max-p99", type=float, help="Fail if overall p99 reply latency exceeds this many ms")
+    output.add_argument("--max-drop-rate", type=float, help="Fail if more than this fraction of AI questions are dropped")
+    output.add_argument("--max-loop-lag", type=float, help="Fail if p99 event loop lag exceeds this many ms")
+    output.add_argument("--max-errors", type=int, help="Fail if more than this many messages raise")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Run against a throwaway copy of the database, never the real one
+    work_dir = tempfile.mkdtemp(prefix="suzu-bench-")
+    if os.path.exists(args.db):
+        shutil.copy(args.db, os.path.join(work_dir, "blackjack.db"))
+    os.environ.setdefault("TWITCH_TOKEN", "oauth:benchmark")
+    os.environ.setdefault("TWITCH_CHANNEL", "bench0")
+    os.environ.setdefault("SUZU_PROMPT_2", "You are Suzu.")
+    sys.path.insert(0, REPO_DIR)
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else log):
+            import suzu_twitch_api_server
+            report = asyncio.run(run_benchmark(args, suzu_twitch_api_server))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    failures = check_thresholds(args, report)
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import random
+
+# A card is an int from 0 to 51: suit * 13 + rank, ranks running 2..10, J, Q, K, A
+RANKS = ('2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A')
+SUITS = ('♥', '♦', '♣', '♠')
+ACE = 12  # Rank index of the ace
+
+# Lookup tables indexed by card, so scoring never touches strings
+RANK_OF = bytes(card % 13 for card in range(52))
+VALUE_OF = bytes(11 if card % 13 == ACE else min(card % 13 + 2, 10) for card in range(52))  # Aces count 11 until softened
+IS_ACE = bytes(card % 13 == ACE for card in range(52))
+CARD_TEXT = tuple(f"{RANKS[card % 13]}{SUITS[card // 13]}" for card in range(52))
+
+
+def new_deck():
+    """A shuffled 52-card deck. Deal with .pop()."""
+    deck = bytearray(range(52))
+    random.shuffle(deck)
+    return deck
+
+
+def is_ace(card):
+    return IS_ACE[card] == 1
+
+
+def format_card(card):
+    return CARD_TEXT[card]
+
+
+def format_hand(hand):
+    return " ".join(CARD_TEXT[card] for card in hand)
+
+
+class Shoe:
+    """A multi-deck shoe with a cut card.
+
+    Cards are dealt off the end of a bytearray. The shoe is only reshuffled
+    between rounds once the cut card comes out. If it runs dry mid-round
+    (a big raid table), everything not on the table is shuffled back in,
+    plus another deck if the table itself holds more than the shoe.
+    """
+
+    def __init__(self, decks=6, penetration=0.75):
+        if not 1 <= decks <= 8:
+            raise ValueError("A shoe holds 1 to 8 decks")
+        if not 0 < penetration <= 1:
+            raise ValueError("Penetration must be above 0 and at most 1")
+        self.decks = decks
+        self.penetration = penetration  # Share of the shoe dealt before the cut card comes out
+        self.cards = bytearray()
+        self.in_play = bytearray()  # Cards dealt this round, still on the table
+        self.cut_at = 0  # Reshuffle once this few cards are left
+        self.shuffles = 0
+        self.shuffle()
+
+    def shuffle(self):
+        """Put every card not on the table back in the shoe and shuffle it."""
+        counts = [self.decks] * 52
+        for card in self.in_play:
+            if counts[card]:
+                counts[card] -= 1
+        cards = bytearray(card for card in range(52) for _ in range(counts[card]))
+        random.shuffle(cards)
+        self.cards = cards
+        self.cut_at = int(self.decks * 52 * (1 - self.penetration))
+        self.shuffles += 1
+
+    def deal(self):
+        if not self.cards:
+            self.shuffle()
+            if not self.cards:
+                # The table holds the whole shoe, bring in another deck
+                self.cards = new_deck()
+        card = self.cards.pop()
+        self.in_play.append(card)
+        return card
+
+    def end_round(self):
+        """Discard the cards on the table and reshuffle if the cut card has come out."""
+        self.in_play = bytearray()
+        if len(self.cards) <= self.cut_at:
+            self.shuffle()
+
+    def __len__(self):
+        return len(self.cards)
+
+
+class Hand:
+    """A blackjack hand that keeps its best total up to date as cards are added.
+
+    `soft_aces` counts aces still counted as 11, so adding a card only ever
+    softens one of them instead of rescoring the whole hand.
+    """
+
+    __slots__ = ("cards", "total", "soft_aces")
+
+    def __init__(self, cards=()):
+        self.cards = bytearray()
+        self.total = 0
+        self.soft_aces = 0
+        for card in cards:
+            self.add(card)
+
+    def add(self, card):
+        """Add a card and return the new total."""
+        self.cards.append(card)
+        self.total += VALUE_OF[card]
+        self.soft_aces += IS_ACE[card]
+        while self.total > 21 and self.soft_aces:
+            self.total -= 10  # Count an ace as 1 instead
+            self.soft_aces -= 1
+        return self.total
+
+    @property
+    def is_bust(self):
+        return self.total > 21
+
+    @property
+    def is_blackjack(self):
+        return self.total == 21 and len(self.cards) == 2
+
+    @property
+    def is_soft(self):
+        return self.soft_aces > 0
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __iter__(self):
+        return iter(self.cards)
+
+    def __getitem__(self, index):
+        return self.cards[index]
+
+    def __str__(self):
+        return format_hand(self.cards)
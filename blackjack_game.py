@@ -1,33 +1,55 @@
-import random
 import sqlite3
-from collections import defaultdict
 import os
 from dotenv import load_dotenv
-from google import generativeai as genai  # Gemini API
+from datetime import datetime
+from lazy import Lazy
+from metrics import timed
+from db_worker import get_db_worker
+from db_connections import get_connection_manager
+from ledger_journal import get_ledger_journal
+from balance_cache import get_balance_cache
+from leaderboard import get_shared_leaderboard
+from ledger_archive import ensure_schema as ensure_ledger_schema
+from blackjack_cards import Hand, is_ace, format_card, format_hand
+from blackjack_table import BlackjackTable
+from narration import get_narration_pool
+
+DEFAULT_CHIPS = 1000  # Starting balance for new users
+HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)  # UPDATE ... RETURNING saves a follow-up SELECT
+
+
+def create_gemini_model():
+    from google import generativeai as genai  # Gemini API, slow to import so only loaded when first needed
+
+    load_dotenv()
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai.GenerativeModel("gemini-2.0-flash")
+
+
+gemini_model = Lazy("blackjack_gemini", create_gemini_model)  # Shared by every game, writes the narration templates
 
 class BlackjackGame:
-    def __init__(self, db_path="blackjack.db"):
-        self.active_games = {}  # Store games by channel name
-        self.player_hands = defaultdict(list)  # Store player hands by username
-        self.dealer_hands = {}  # Store dealer hands by channel
-        self.deck = {}  # Store deck by channel
-        self.game_status = {}  # Store game status by channel
-        self.player_bets = {}  # Store player bets
-        self.pot = {}  # Store the pot for each channel
-        self.players = {}  # Store players by channel
+    def __init__(self, db_path="blackjack.db", ledger_flush_interval=None):
+        self.tables = {}  # BlackjackTable by channel name
+        self.shoe_decks = 6  # Decks per shoe, 1 to 8
+        self.shoe_penetration = 0.75  # Share of the shoe dealt before it is reshuffled
         
         # Set up database
         self.db_path = db_path
+        self.db = get_connection_manager(db_path)  # Shared, persistent connections with WAL
+        self.db_worker = get_db_worker(db_path)  # The bot runs game calls on this thread, off the event loop
+        self.balances = get_balance_cache(db_path)  # Chip balances shared with the RPG, kept in sync on every write
         self.setup_database()
-
-        load_dotenv()
-        self.GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-        genai.configure(api_key=self.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel("gemini-2.0-flash")
+        self.leaderboard = get_shared_leaderboard(db_path)  # Chip ranking kept in memory, loaded on first use
+        self.narration = get_narration_pool(db_path)  # Suzu's pre-written round announcements, shared with the RPG
+        # With a flush interval, chip operations on the DB thread are committed in groups instead of one at a time
+        self.ledger = get_ledger_journal(db_path, ledger_flush_interval) if ledger_flush_interval else None
+        self.model = gemini_model  # Configured on first use
         
+    @timed("db_query_seconds", "SQLite call latency by method")
     def setup_database(self):
         """Create the database and tables if they don't exist"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.connection()
         cursor = conn.cursor()
         
         # Create users table to store chip balances
@@ -54,221 +76,281 @@ class BlackjackGame:
         )
         ''')
         
+        # Lets a full leaderboard reload walk users in ranking order instead of sorting them
+        cursor.execute("DROP INDEX IF EXISTS idx_users_chips")  # Older, chips-only version
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_ranking ON users(chips DESC, username)")
+        
         conn.commit()
-        conn.close()
+        
+        # Ledger index and the monthly rollups that archived rows are folded into
+        ensure_ledger_schema(conn)
     
+    @timed("db_query_seconds", "SQLite call latency by method")
     def get_user_chips(self, username):
         """Get a user's chip balance"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        conn = self.db.connection()
         
-        # Check if user exists
-        cursor.execute("SELECT chips FROM users WHERE username = ?", (username,))
-        result = cursor.fetchone()
+        # Check if user exists, usually answered from the balance cache
+        profile = self.balances.fetch(conn, username)
         
-        if result is None:
+        if profile is None:
             # New user - create with default balance
-            default_chips = 1000
-            cursor.execute(
-                "INSERT INTO users (username, chips) VALUES (?, ?)",
-                (username, default_chips)
+            conn.execute(
+                "INSERT INTO users (username, chips) VALUES (?, ?) ON CONFLICT(username) DO NOTHING",
+                (username, DEFAULT_CHIPS)
             )
             conn.commit()
-            chips = default_chips
+            chips = DEFAULT_CHIPS
+            self.leaderboard.set_chips(username, chips)
         else:
-            chips = result[0]
+            chips = profile["chips"]
         
-        conn.close()
         return chips
-    
-    def update_user_chips(self, username, amount, transaction_type):
-        """Update a user's chip balance"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Get current balance
-        current_chips = self.get_user_chips(username)
-        new_balance = current_chips + amount
-        
-        # Update balance
+
+    def _credit(self, cursor, username, amount):
+        """Add `amount` to a balance (creating the user if needed) and return the new balance"""
+        if HAS_RETURNING:
+            cursor.execute(
+                "INSERT INTO users (username, chips) VALUES (?, ?) "
+                "ON CONFLICT(username) DO UPDATE SET chips = chips + ? RETURNING chips",
+                (username, DEFAULT_CHIPS + amount, amount)
+            )
+            return cursor.fetchone()[0]
+
         cursor.execute(
-            "UPDATE users SET chips = ? WHERE username = ?",
-            (new_balance, username)
+            "INSERT INTO users (username, chips) VALUES (?, ?) ON CONFLICT(username) DO UPDATE SET chips = chips + ?",
+            (username, DEFAULT_CHIPS + amount, amount)
         )
-        
-        # Record transaction
+        cursor.execute("SELECT chips FROM users WHERE username = ?", (username,))
+        return cursor.fetchone()[0]
+
+    def _debit(self, cursor, username, amount):
+        """Take `amount` from a balance only if it covers it. Returns the new balance, or None if it doesn't"""
         cursor.execute(
-            "INSERT INTO transactions (username, amount, type) VALUES (?, ?, ?)",
-            (username, amount, transaction_type)
+            "INSERT INTO users (username, chips) VALUES (?, ?) ON CONFLICT(username) DO NOTHING",
+            (username, DEFAULT_CHIPS)
         )
-        
-        conn.commit()
-        conn.close()
+        if HAS_RETURNING:
+            cursor.execute(
+                "UPDATE users SET chips = chips - ? WHERE username = ? AND chips >= ? RETURNING chips",
+                (amount, username, amount)
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+        cursor.execute(
+            "UPDATE users SET chips = chips - ? WHERE username = ? AND chips >= ?",
+            (amount, username, amount)
+        )
+        if cursor.rowcount == 0:
+            return None
+        cursor.execute("SELECT chips FROM users WHERE username = ?", (username,))
+        return cursor.fetchone()[0]
+
+    def _record(self, cursor, rows):
+        """Add (username, amount, type) rows to the transactions ledger"""
+        cursor.executemany("INSERT INTO transactions (username, amount, type) VALUES (?, ?, ?)", rows)
+
+    @timed("db_query_seconds", "SQLite call latency by method")
+    def update_user_chips(self, username, amount, transaction_type):
+        """Add to (or subtract from) a user's chip balance and record it, in one transaction"""
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
+            new_balance = self._credit(cursor, username, amount)
+            self._record(cursor, [(username, amount, transaction_type)])
+        self.balances.update(username, chips=new_balance)
+        self.leaderboard.set_chips(username, new_balance)
         return new_balance
+
+    @timed("db_query_seconds", "SQLite call latency by method")
+    def debit_chips(self, username, amount, transaction_type):
+        """Take chips from a user only if they have enough. Returns (True, new balance) or (False, current balance)"""
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
+            new_balance = self._debit(cursor, username, amount)
+            if new_balance is not None:
+                self._record(cursor, [(username, -amount, transaction_type)])
+
+        if new_balance is None:
+            return False, self.get_user_chips(username)
+        self.balances.update(username, chips=new_balance)
+        self.leaderboard.set_chips(username, new_balance)
+        return True, new_balance
+
+    @timed("db_query_seconds", "SQLite call latency by method")
+    def transfer_chips(self, sender, recipient, amount):
+        """Move chips between users in one transaction. Returns (True, recipient's balance) or (False, sender's balance)"""
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
+            sender_balance = self._debit(cursor, sender, amount)
+            if sender_balance is not None:
+                recipient_balance = self._credit(cursor, recipient, amount)
+                self._record(cursor, [(sender, -amount, "give_sent"), (recipient, amount, "give_received")])
+
+        if sender_balance is None:
+            return False, self.get_user_chips(sender)
+        self.balances.update(sender, chips=sender_balance)
+        self.balances.update(recipient, chips=recipient_balance)
+        self.leaderboard.set_chips(sender, sender_balance)
+        self.leaderboard.set_chips(recipient, recipient_balance)
+        return True, recipient_balance
     
+    @timed("db_query_seconds", "SQLite call latency by method")
     def update_stats(self, username, result):
         """Update user statistics"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Increment total games
-        cursor.execute(
-            "UPDATE users SET total_games = total_games + 1 WHERE username = ?",
-            (username,)
-        )
-        
-        # Update specific result counter
-        if result == "win":
-            cursor.execute(
-                "UPDATE users SET wins = wins + 1 WHERE username = ?",
-                (username,)
-            )
-        elif result == "loss":
-            cursor.execute(
-                "UPDATE users SET losses = losses + 1 WHERE username = ?",
-                (username,)
-            )
-        elif result == "push":
+        self.leaderboard.record_result(username, result)
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
+
+            # Increment total games
             cursor.execute(
-                "UPDATE users SET pushes = pushes + 1 WHERE username = ?",
+                "UPDATE users SET total_games = total_games + 1 WHERE username = ?",
                 (username,)
             )
-        
-        conn.commit()
-        conn.close()
+
+            # Update specific result counter
+            if result == "win":
+                cursor.execute(
+                    "UPDATE users SET wins = wins + 1 WHERE username = ?",
+                    (username,)
+                )
+            elif result == "loss":
+                cursor.execute(
+                    "UPDATE users SET losses = losses + 1 WHERE username = ?",
+                    (username,)
+                )
+            elif result == "push":
+                cursor.execute(
+                    "UPDATE users SET pushes = pushes + 1 WHERE username = ?",
+                    (username,)
+                )
     
-    def get_leaderboard(self, limit=5):
-        """Get the top players by chip count"""
-        conn = sqlite3.connect(self.db_path)
+    @timed("db_query_seconds", "SQLite call latency by method")
+    def get_last_daily_claim(self, username):
+        """When the user last claimed daily chips, or None if they never have"""
+        conn = self.db.connection()
         cursor = conn.cursor()
-        
+
         cursor.execute(
-            "SELECT username, chips, wins, losses FROM users ORDER BY chips DESC LIMIT ?",
-            (limit,)
+            "SELECT timestamp FROM transactions WHERE username = ? AND type = 'daily' ORDER BY timestamp DESC LIMIT 1",
+            (username,)
         )
-        
-        leaderboard = cursor.fetchall()
-        conn.close()
-        return leaderboard
-    
-    def create_deck(self):
-        """Create a new shuffled deck of cards"""
-        suits = ['♥', '♦', '♣', '♠']
-        values = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-        deck = [(value, suit) for suit in suits for value in values]
-        random.shuffle(deck)
-        return deck
+
+        last_claim = cursor.fetchone()
+
+        if not last_claim:
+            return None
+        return datetime.strptime(last_claim[0], "%Y-%m-%d %H:%M:%S")
+
+    @timed("db_query_seconds", "SQLite call latency by method")
+    def get_leaderboard(self, limit=5, offset=0):
+        """Get the top players by chip count as (username, chips, wins, losses), served from memory"""
+        if self.leaderboard.is_stale():
+            # Picks up balances changed by other processes sharing the database
+            self.leaderboard.load(self.db.connection())
+        return self.leaderboard.top(limit, offset)
+
+    def get_rank(self, username):
+        """A user's (rank, players ranked, chips), or None if they have never played"""
+        if self.leaderboard.is_stale():
+            self.leaderboard.load(self.db.connection())
+        return self.leaderboard.rank(username)
     
-    def card_value(self, card):
-        """Calculate the value of a card"""
-        value, _ = card
-        if value in ['J', 'Q', 'K']:
-            return 10
-        elif value == 'A':
-            return 11  # Aces are initially 11, can be reduced to 1 if needed
-        else:
-            return int(value)
+    def get_table(self, channel):
+        """The table for a channel, created on first use"""
+        table = self.tables.get(channel)
+        if table is None:
+            table = self.tables[channel] = BlackjackTable(channel, self.shoe_decks, self.shoe_penetration)
+        return table
     
     def hand_value(self, hand):
-        """Calculate the value of a hand, accounting for aces"""
-        value = sum(self.card_value(card) for card in hand)
-        # Adjust for aces if needed
-        aces = sum(1 for card in hand if card[0] == 'A')
-        while value > 21 and aces > 0:
-            value -= 10  # Convert an ace from 11 to 1
-            aces -= 1
-        return value
+        """The value of a Hand, kept up to date as cards are dealt"""
+        return hand.total
     
     def format_card(self, card):
         """Format a card for display"""
-        value, suit = card
-        return f"{value}{suit}"
+        return format_card(card)
     
     def format_hand(self, hand):
         """Format a hand for display"""
-        return " ".join(self.format_card(card) for card in hand)
+        return format_hand(hand)
     
     def start_game(self, channel):
         """Start a new blackjack game in the channel"""
-        if channel in self.active_games and self.active_games[channel]:
+        table = self.get_table(channel)
+        if table.active:
             return "A game is already in progress!"
         
-        self.active_games[channel] = True
-        self.deck[channel] = self.create_deck()
-        self.dealer_hands[channel] = []
-        self.player_hands.clear()
-        self.player_bets.clear()
-        self.pot[channel] = 0  # Initialize the pot for the channel
-        self.game_status[channel] = "betting"
+        # Fresh hands, bets and pot, the shoe is only reshuffled at the cut card
+        table.reset()
         
         return "🎲 Blackjack game started! Type '~bet [amount]' to join!"
     
     def join_game(self, channel, username, bet=10):
         """Player joins the game with a bet"""
-        if channel not in self.active_games or not self.active_games[channel]:
+        table = self.tables.get(channel)
+        if table is None or not table.active:
             return "No game in progress. Type '~blackjack' to start a game!"
         
-        if self.game_status[channel] != "betting":
+        if table.phase != "betting":
             return "Betting period is over! Wait for the next game."
         
-        if username in self.player_hands:
+        if username in table.hands:
             return f"{username}, you're already in this game!"
         
-        # Check if player has enough chips
-        current_chips = self.get_user_chips(username)
         if bet <= 0:
             return f"{username}, you must bet at least 1 chip!"
         
-        if current_chips < bet:
-            return f"Sorry {username}, you only have {current_chips} chips. Bet a smaller amount."
-        
-        # Deduct bet from player's balance
-        self.update_user_chips(username, -bet, "bet")
+        # Deduct bet from player's balance, only if they have enough chips
+        paid, balance = self.debit_chips(username, bet, "bet")
+        if not paid:
+            return f"Sorry {username}, you only have {balance} chips. Bet a smaller amount."
         
         # Store the bet
-        self.player_bets[username] = bet
+        table.bets[username] = bet
         
         # Add the bet to the pot
-        self.pot[channel] += bet
+        table.pot += bet
         
         # Deal initial cards
-        self.player_hands[username] = [self.deck[channel].pop(), self.deck[channel].pop()]
+        table.hands[username] = Hand((table.deal(), table.deal()))
         
-        hand_value = self.hand_value(self.player_hands[username])
-        return f"{username} joins with {bet} chips! Your cards: {self.format_hand(self.player_hands[username])} ({hand_value}) | Balance: {current_chips - bet} chips"
+        hand_value = self.hand_value(table.hands[username])
+        return f"{username} joins with {bet} chips! Your cards: {self.format_hand(table.hands[username])} ({hand_value}) | Balance: {balance} chips"
     
     def start_dealing(self, channel):
         """Start the dealing phase after betting is complete"""
-        if channel not in self.active_games or not self.active_games[channel]:
+        table = self.tables.get(channel)
+        if table is None or not table.active:
             return "No game in progress!"
         
-        if len(self.player_hands) == 0:
-            self.active_games[channel] = False
+        if len(table.hands) == 0:
+            table.end()
             return "No players joined! Game cancelled."
         
-        self.game_status[channel] = "playing"
+        table.phase = "playing"
         
         # Deal dealer's cards
-        self.dealer_hands[channel] = [self.deck[channel].pop(), self.deck[channel].pop()]
-        dealer_card = self.format_card(self.dealer_hands[channel][0])
+        table.dealer_hand = Hand((table.deal(), table.deal()))
+        dealer_card = self.format_card(table.dealer_hand[0])
         
         return f"Dealing begins! Dealer shows: {dealer_card} ?️"
     
     def hit(self, channel, username):
         """Player requests another card"""
-        if channel not in self.active_games or not self.active_games[channel]:
+        table = self.tables.get(channel)
+        if table is None or not table.active:
             return "No game in progress!"
         
-        if self.game_status[channel] != "playing":
+        if table.phase != "playing":
             return "It's not time to hit yet!"
         
-        if username not in self.player_hands:
+        if username not in table.hands:
             return f"{username}, you're not in this game!"
         
         # Deal a new card
-        self.player_hands[username].append(self.deck[channel].pop())
-        hand = self.player_hands[username]
-        hand_value = self.hand_value(hand)
+        hand = table.hands[username]
+        hand_value = hand.add(table.deal())
         
         if hand_value > 21:
             # Player busts - update stats
@@ -280,57 +362,48 @@ class BlackjackGame:
         
         return result
     
-    def winning_response(self, channel, message):
-        user_input = message
-        suzu_prompt = os.getenv("SUZU_PROMPT_2")
-        winning_prompt = suzu_prompt + f""" Craft a single chat message only no additional text to tell the chat who won the blackjack game, and here is the text with that information."""
-
-        if not user_input:
-            return "No input provided"
-        
-        try:
-            # Gemini API Call
-            response = self.model.generate_content([winning_prompt, user_input])
-            ai_response = response.text.strip()
-            return ai_response
-        except Exception as e:
-            print(f"Error in winning_response generation: {str(e)}")
-            # Fallback to a default response
-            fallback_response = user_input
-            return fallback_response
+    def winning_response(self, channel):
+        """Suzu's announcement of the round dealer_play just settled, filled in from pre-written templates"""
+        table = self.tables.get(channel)
+        if table is None or table.settled is None:
+            return None  # No round was settled, nothing to announce
+        (outcome, values), table.settled = table.settled, None
+        return self.narration.render(outcome, **values)
 
     def stand(self, channel, username):
         """Player stands with current hand"""
-        if channel not in self.active_games or not self.active_games[channel]:
+        table = self.tables.get(channel)
+        if table is None or not table.active:
             return "No game in progress!"
         
-        if self.game_status[channel] != "playing":
+        if table.phase != "playing":
             return "It's not time to stand yet!"
         
-        if username not in self.player_hands:
+        if username not in table.hands:
             return f"{username}, you're not in this game!"
         
-        hand = self.player_hands[username]
+        hand = table.hands[username]
         hand_value = self.hand_value(hand)
         
         return f"{username} stands with {hand_value}. Cards: {self.format_hand(hand)}"
     
     def dealer_play(self, channel):
         """Dealer plays their hand"""
-        if channel not in self.active_games or not self.active_games[channel]:
+        table = self.tables.get(channel)
+        if table is None or not table.active:
             return "No game in progress!"
         
-        if self.game_status[channel] != "playing":
+        if table.phase != "playing":
             return "It's not time for the dealer to play yet!"
         
-        dealer_hand = self.dealer_hands[channel]
+        dealer_hand = table.dealer_hand
         
         # Dealer hits until they have at least 17
-        while self.hand_value(dealer_hand) < 17:
-            dealer_hand.append(self.deck[channel].pop())
+        while dealer_hand.total < 17:
+            dealer_hand.add(table.deal())
         
-        dealer_value = self.hand_value(dealer_hand)
-        dealer_busted = dealer_value > 21
+        dealer_value = dealer_hand.total
+        dealer_busted = dealer_hand.is_bust
         
         # Determine results for all players
         results = [f"Dealer has: {self.format_hand(dealer_hand)} ({dealer_value})"]
@@ -339,10 +412,10 @@ class BlackjackGame:
             results.append("Dealer busts!")
         
         winners = []
-        for player, hand in self.player_hands.items():
-            player_value = self.hand_value(hand)
+        for player, hand in table.hands.items():
+            player_value = hand.total
             
-            if player_value > 21:
+            if hand.is_bust:
                 # Player already busted
                 results.append(f"{player} busted with {player_value}")
             elif dealer_busted or player_value > dealer_value:
@@ -360,25 +433,25 @@ class BlackjackGame:
         if len(winners) == 1:
             # Single winner takes the entire pot
             winner = winners[0]
-            new_balance = self.update_user_chips(winner, self.pot[channel], "win")
-            results.append(f"{winner} takes the pot of {self.pot[channel]} chips! New balance: {new_balance} chips")
+            new_balance = self.update_user_chips(winner, table.pot, "win")
+            results.append(f"{winner} takes the pot of {table.pot} chips! New balance: {new_balance} chips")
         elif len(winners) > 1:
             # Split the pot among winners, ensuring each gets their original bet back
-            total_bets = sum(self.player_bets[player] for player in winners)
-            remaining_pot = self.pot[channel] - total_bets
+            total_bets = sum(table.bets[player] for player in winners)
+            remaining_pot = table.pot - total_bets
             
             if remaining_pot < 0:
                 remaining_pot = 0
             
             split_amount = remaining_pot // len(winners)
             for winner in winners:
-                original_bet = self.player_bets[winner]
+                original_bet = table.bets[winner]
                 payout = original_bet + split_amount
                 new_balance = self.update_user_chips(winner, payout, "win")
                 results.append(f"{winner} wins {payout} chips (original bet + split)! New balance: {new_balance} chips")
-        elif len(self.player_hands) == 1 and "suzu" in self.player_hands:
-            player = list(self.player_hands.keys())[0]
-            split_amount = self.pot[channel] // 2
+        elif len(table.hands) == 1 and "suzu" in table.hands:
+            player = list(table.hands.keys())[0]
+            split_amount = table.pot // 2
             new_balance = self.update_user_chips(player, split_amount, "split")
             results.append(f"Only {player} and Suzu played. {player} takes half the pot: {split_amount} chips! New balance: {new_balance} chips")
         else:
@@ -386,18 +459,35 @@ class BlackjackGame:
             results.append("No winners. The pot remains with the dealer.")
         
         # # Special case: Only one player and Suzu
-        # if len(self.player_hands) == 1 and "suzu" in self.player_hands:
-        #     player = list(self.player_hands.keys())[0]
-        #     split_amount = self.pot[channel] // 2
+        # if len(table.hands) == 1 and "suzu" in table.hands:
+        #     player = list(table.hands.keys())[0]
+        #     split_amount = table.pot // 2
         #     new_balance = self.update_user_chips(player, split_amount, "split")
         #     results.append(f"Only {player} and Suzu played. {player} takes half the pot: {split_amount} chips! New balance: {new_balance} chips")
         
-        # End the game
-        self.active_games[channel] = False
-        
-        winning_message = self.winning_response(channel, "\n".join(results))
-        return winning_message
+        # End the game, the bot announces the outcome separately with winning_response
+        if dealer_busted and winners:
+            outcome = "blackjack_dealer_bust"
+        elif len(winners) == 1:
+            outcome = "blackjack_single"
+        elif winners:
+            outcome = "blackjack_split"
+        else:
+            outcome = "blackjack_house"
+        table.settled = (outcome, {
+            "winner": winners[0] if winners else "",
+            "winners": ", ".join(winners),
+            "pot": table.pot,
+        })
+        table.end()
+        
+        return "\n".join(results)
     
+    def close(self):
+        """Commit any chip operations still waiting in the ledger group and stop grouping"""
+        if self.ledger is not None:
+            self.ledger.close()
+
     def get_balance(self, username):
         """Get a user's current balance"""
         chips = self.get_user_chips(username)
@@ -411,9 +501,10 @@ class BlackjackGame:
         new_balance = self.update_user_chips(username, amount, "admin_add")
         return f"Added {amount} chips to {username}'s balance. New balance: {new_balance} chips"
     
+    @timed("db_query_seconds", "SQLite call latency by method")
     def get_stats(self, username):
         """Get a user's statistics"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.connection()
         cursor = conn.cursor()
         
         cursor.execute(
@@ -422,7 +513,6 @@ class BlackjackGame:
         )
         
         result = cursor.fetchone()
-        conn.close()
         
         if not result:
             return f"{username} hasn't played any games yet."
@@ -434,36 +524,34 @@ class BlackjackGame:
 
     def double_down(self, channel, username):
         """Double the bet and take exactly one more card"""
-        if channel not in self.active_games or not self.active_games[channel]:
+        table = self.tables.get(channel)
+        if table is None or not table.active:
             return "No game in progress!"
         
-        if self.game_status[channel] != "playing":
+        if table.phase != "playing":
             return "It's not time to double down yet!"
         
-        if username not in self.player_hands:
+        if username not in table.hands:
             return f"{username}, you're not in this game!"
         
         # Check if player has already hit (can only double down on initial hand)
-        if len(self.player_hands[username]) > 2:
+        if len(table.hands[username]) > 2:
             return f"{username}, you can only double down on your initial hand!"
         
         # Check if player has enough chips for the additional bet
-        current_bet = self.player_bets.get(username, 10)
-        current_chips = self.get_user_chips(username)
+        current_bet = table.bets.get(username, 10)
         
-        if current_chips < current_bet:
+        # Deduct additional bet, only if they have enough chips
+        paid, _ = self.debit_chips(username, current_bet, "double_down")
+        if not paid:
             return f"Sorry {username}, you need {current_bet} more chips to double down."
         
-        # Deduct additional bet
-        self.update_user_chips(username, -current_bet, "double_down")
-        
         # Double the bet
-        self.player_bets[username] = current_bet * 2
+        table.bets[username] = current_bet * 2
         
         # Deal exactly one more card
-        self.player_hands[username].append(self.deck[channel].pop())
-        hand = self.player_hands[username]
-        hand_value = self.hand_value(hand)
+        hand = table.hands[username]
+        hand_value = hand.add(table.deal())
         
         result = f"{username} doubles down to {current_bet * 2} chips and gets {self.format_card(hand[-1])}. "
         
@@ -478,48 +566,47 @@ class BlackjackGame:
 
     def insurance(self, channel, username):
         """Place an insurance bet against dealer blackjack"""
-        if channel not in self.active_games or not self.active_games[channel]:
+        table = self.tables.get(channel)
+        if table is None or not table.active:
             return "No game in progress!"
         
-        if self.game_status[channel] != "playing":
+        if table.phase != "playing":
             return "It's not time for insurance!"
         
-        if username not in self.player_hands:
+        if username not in table.hands:
             return f"{username}, you're not in this game!"
         
         # Check if dealer's up card is an Ace
-        dealer_up_card = self.dealer_hands[channel][0]
-        if dealer_up_card[0] != 'A':
+        dealer_up_card = table.dealer_hand[0]
+        if not is_ace(dealer_up_card):
             return f"Insurance is only available when the dealer shows an Ace!"
         
         # Check if player already has insurance
-        if f"{username}_insurance" in self.player_bets:
+        if username in table.insurance:
             return f"{username}, you already have insurance!"
         
         # Insurance costs half the original bet
-        original_bet = self.player_bets.get(username, 10)
+        original_bet = table.bets.get(username, 10)
         insurance_cost = original_bet // 2
         
-        # Check if player has enough chips
-        current_chips = self.get_user_chips(username)
-        if current_chips < insurance_cost:
+        # Deduct insurance cost, only if they have enough chips
+        paid, _ = self.debit_chips(username, insurance_cost, "insurance")
+        if not paid:
             return f"Sorry {username}, you need {insurance_cost} chips for insurance."
         
-        # Deduct insurance cost
-        self.update_user_chips(username, -insurance_cost, "insurance")
-        
         # Store insurance bet
-        self.player_bets[f"{username}_insurance"] = insurance_cost
+        table.insurance[username] = insurance_cost
         
         return f"{username} places an insurance bet of {insurance_cost} chips."
 
     def check_dealer_blackjack(self, channel):
         """Check if dealer has blackjack and process insurance bets"""
-        if channel not in self.active_games or not self.active_games[channel]:
+        table = self.tables.get(channel)
+        if table is None or not table.active:
             return "No game in progress!"
         
-        dealer_hand = self.dealer_hands[channel]
-        dealer_has_blackjack = len(dealer_hand) == 2 and self.hand_value(dealer_hand) == 21
+        dealer_hand = table.dealer_hand
+        dealer_has_blackjack = dealer_hand.is_blackjack
         
         results = []
         
@@ -527,24 +614,22 @@ class BlackjackGame:
             results.append(f"Dealer has blackjack! {self.format_hand(dealer_hand)}")
             
             # Process insurance bets
-            for player in list(self.player_hands.keys()):
-                insurance_key = f"{player}_insurance"
-                
-                if insurance_key in self.player_bets:
+            for player in list(table.hands.keys()):
+                if player in table.insurance:
                     # Insurance pays 2:1
-                    insurance_bet = self.player_bets[insurance_key]
+                    insurance_bet = table.insurance[player]
                     insurance_payout = insurance_bet * 3  # Original bet + 2x winnings
                     
                     self.update_user_chips(player, insurance_payout, "insurance_win")
                     results.append(f"{player} wins {insurance_bet * 2} chips on insurance! Total payout: {insurance_payout}")
                 
                 # Player loses main bet unless they also have blackjack
-                player_hand = self.player_hands[player]
-                player_has_blackjack = len(player_hand) == 2 and self.hand_value(player_hand) == 21
+                player_hand = table.hands[player]
+                player_has_blackjack = player_hand.is_blackjack
                 
                 if player_has_blackjack:
                     # Push on blackjack vs blackjack
-                    original_bet = self.player_bets[player]
+                    original_bet = table.bets[player]
                     self.update_user_chips(player, original_bet, "push")
                     self.update_stats(player, "push")
                     results.append(f"{player} pushes with blackjack vs dealer blackjack.")
@@ -554,14 +639,13 @@ class BlackjackGame:
                     results.append(f"{player} loses to dealer blackjack.")
             
             # End the game
-            self.active_games[channel] = False
+            table.end()
         else:
             results.append("Dealer does not have blackjack. Game continues!")
             
             # Insurance bets lose
-            for player in list(self.player_hands.keys()):
-                insurance_key = f"{player}_insurance"
-                if insurance_key in self.player_bets:
+            for player in list(table.hands.keys()):
+                if player in table.insurance:
                     results.append(f"{player} loses their insurance bet.")
         
         return "\n".join(results)
\ No newline at end of file
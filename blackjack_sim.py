@@ -0,0 +1,284 @@
+"""Monte Carlo simulator for the blackjack economy.
+
+Plays millions of rounds with the payout rules of BlackjackGame: the pot of
+main bets goes to a single winner, or is split between several winners, each
+getting their own bet back first. Doubles are debited but never added to the
+pot, insurance pays 3x its cost only when someone runs ~check, and pushes
+return nothing. Reports the house edge, how many chips the game creates or
+destroys per hour, and how much each optional rule moves the edge and the
+variance. It also benchmarks the hand-evaluation code.
+
+    python blackjack_sim.py --rounds 2000000 --players 4 --strategies basic,dealer
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from blackjack_cards import VALUE_OF, IS_ACE, Hand, Shoe
+
+DEALER_STANDS = 17  # BlackjackGame.dealer_play draws until the dealer has at least this
+MAX_HITS = 8  # Cards a player may draw after the first two, more is vanishingly rare
+MAX_DEALER_HITS = 10
+
+VALUES = np.frombuffer(VALUE_OF, dtype=np.uint8).astype(np.int16)
+ACES = np.frombuffer(IS_ACE, dtype=np.uint8).astype(np.int16)
+
+STRATEGIES = ("basic", "dealer", "cautious", "stand")
+RULES = ("double", "insurance", "check")  # Optional plays whose effect is compared in the report
+
+
+def add_cards(total, soft, cards, mask):
+    """Vectorized Hand.add for the rows in mask."""
+    total += np.where(mask, VALUES[cards], 0)
+    soft += np.where(mask, ACES[cards], 0)
+    for _ in range(2):  # A card is worth at most 11, so two softened aces always suffice
+        fix = (total > 21) & (soft > 0)
+        total -= np.where(fix, 10, 0)
+        soft -= fix
+
+
+def wants_hit(strategy, total, soft, up):
+    """Whether each hand hits, given its total, soft aces and the dealer's up card value."""
+    if strategy == "dealer":
+        return total < DEALER_STANDS
+    if strategy == "cautious":
+        return total < 12
+    if strategy == "stand":
+        return np.zeros_like(total, dtype=bool)
+    # basic: a simplified basic strategy
+    is_soft = soft > 0
+    hard_hit = (total < 12) | ((total < 17) & (up >= 7))
+    soft_hit = (total < 18) | ((total == 18) & (up >= 9))
+    return np.where(is_soft, soft_hit, hard_hit)
+
+
+def wants_double(strategy, total, soft, up):
+    if strategy != "basic":
+        return np.zeros_like(total, dtype=bool)
+    return (soft == 0) & ((total == 11) | ((total == 10) & (up <= 9)))
+
+
+def deal_cards(rng, rounds, count, decks):
+    """`count` cards per round from a freshly shuffled shoe, or with replacement if a round needs more than the shoe."""
+    shoe_size = decks * 52
+    if count > shoe_size:
+        return rng.integers(0, 52, size=(rounds, count), dtype=np.uint8)
+    shoe = np.tile(np.arange(52, dtype=np.uint8), decks)
+    return rng.permuted(np.broadcast_to(shoe, (rounds, shoe_size)), axis=1)[:, :count]
+
+
+def simulate(rounds, players, strategies, bet, decks, rules, seed):
+    """Play `rounds` rounds and return summed results as plain numbers.
+
+    Cards come from fixed positions of a shuffled shoe (each hand its own
+    block), which deals the same as drawing them in table order.
+    """
+    rng = np.random.default_rng(seed)
+    cards = deal_cards(rng, rounds, 2 * players + 2 + players * MAX_HITS + MAX_DEALER_HITS, decks)
+    dealer_start = 2 * players
+    hits_start = dealer_start + 2
+    dealer_hits_start = hits_start + players * MAX_HITS
+
+    zeros = lambda: np.zeros((rounds, players), dtype=np.int64)
+    totals, softs = zeros(), zeros()
+    for seat in range(players):
+        for i in range(2):
+            add_cards(totals[:, seat], softs[:, seat], cards[:, 2 * seat + i], True)
+
+    dealer_total = np.zeros(rounds, dtype=np.int64)
+    dealer_soft = np.zeros(rounds, dtype=np.int64)
+    for i in range(2):
+        add_cards(dealer_total, dealer_soft, cards[:, dealer_start + i], True)
+    up = VALUES[cards[:, dealer_start]]
+    up_ace = ACES[cards[:, dealer_start]] == 1
+    dealer_blackjack = dealer_total == 21
+    player_blackjack = totals == 21
+
+    stake = np.full((rounds, players), bet, dtype=np.int64)  # What each seat has on the main bet
+    paid = stake.copy()  # Everything each seat was debited
+    payout = zeros()
+    pot = np.full(rounds, bet * players, dtype=np.int64)  # Doubles never reach the pot
+
+    # ~insurance when the dealer shows an ace, settled by ~check
+    insured = np.broadcast_to(up_ace[:, None], (rounds, players)) if "insurance" in rules else np.zeros((rounds, players), dtype=bool)
+    insurance_cost = np.where(insured, bet // 2, 0)
+    paid += insurance_cost
+    over = np.zeros(rounds, dtype=bool)  # Rounds ended by ~check on a dealer blackjack
+    if "check" in rules:
+        over = dealer_blackjack
+        payout += np.where(over[:, None] & insured, insurance_cost * 3, 0)
+        payout += np.where(over[:, None] & player_blackjack, stake, 0)  # Blackjack against blackjack is a push
+
+    truncated = 0
+    for seat, strategy in enumerate(strategies):
+        total, soft = totals[:, seat], softs[:, seat]
+        playing = ~over
+        if "double" in rules:
+            double = playing & wants_double(strategy, total, soft, up)
+            stake[:, seat] += np.where(double, bet, 0)
+            paid[:, seat] += np.where(double, bet, 0)
+            add_cards(total, soft, cards[:, hits_start + seat * MAX_HITS], double)
+            playing &= ~double
+            first_hit = 1
+        else:
+            first_hit = 0
+        for i in range(first_hit, MAX_HITS):
+            hit = playing & (total <= 21) & wants_hit(strategy, total, soft, up)
+            if not hit.any():
+                break
+            add_cards(total, soft, cards[:, hits_start + seat * MAX_HITS + i], hit)
+        else:
+            truncated += int((playing & (total <= 21) & wants_hit(strategy, total, soft, up)).sum())
+
+    for i in range(MAX_DEALER_HITS):
+        hit = ~over & (dealer_total < DEALER_STANDS)
+        if not hit.any():
+            break
+        add_cards(dealer_total, dealer_soft, cards[:, dealer_hits_start + i], hit)
+
+    # dealer_play: one winner takes the pot, several get their bet back plus an even share of what's left
+    dealer_bust = dealer_total > 21
+    winners = ~over[:, None] & (totals <= 21) & (dealer_bust[:, None] | (totals > dealer_total[:, None]))
+    winner_count = winners.sum(axis=1)
+    winner_stakes = np.where(winners, stake, 0).sum(axis=1)
+    share = np.maximum(pot - winner_stakes, 0) // np.maximum(winner_count, 1)
+    single = winner_count == 1
+    payout += np.where(winners & single[:, None], pot[:, None], 0)
+    payout += np.where(winners & ~single[:, None], stake + share[:, None], 0)
+
+    net = payout - paid  # Per seat, per round
+    house = -net.sum(axis=1)
+    return {
+        "rounds": rounds,
+        "hands": rounds * players,
+        "wagered": int(paid.sum()),
+        "house": int(house.sum()),
+        "house_sq": float((house.astype(np.float64) ** 2).sum()),
+        "seat_net": net.sum(axis=0).tolist(),
+        "seat_net_sq": (net.astype(np.float64) ** 2).sum(axis=0).tolist(),
+        "seat_wins": winners.sum(axis=0).tolist(),
+        "truncated": truncated,
+    }
+
+
+def merge(results):
+    merged = dict(results[0])
+    for result in results[1:]:
+        for key, value in result.items():
+            merged[key] = [a + b for a, b in zip(merged[key], value)] if isinstance(value, list) else merged[key] + value
+    return merged
+
+
+def run(args, rules, pool):
+    """Simulate args.rounds rounds split across the pool, same seeds for every rule set."""
+    chunks = [args.chunk] * (args.rounds // args.chunk) + ([args.rounds % args.chunk] if args.rounds % args.chunk else [])
+    seeds = np.random.SeedSequence(args.seed).spawn(len(chunks))
+    strategies = [args.strategies[seat % len(args.strategies)] for seat in range(args.players)]
+    futures = [
+        pool.submit(simulate, rounds, args.players, strategies, args.bet, args.decks, rules, seed)
+        for rounds, seed in zip(chunks, seeds)
+    ]
+    return merge([future.result() for future in futures])
+
+
+def summarize(result, args):
+    rounds = result["rounds"]
+    house_mean = result["house"] / rounds
+    house_std = max(result["house_sq"] / rounds - house_mean ** 2, 0) ** 0.5
+    seats = []
+    for seat in range(args.players):
+        mean = result["seat_net"][seat] / rounds
+        std = max(result["seat_net_sq"][seat] / rounds - mean ** 2, 0) ** 0.5
+        seats.append({
+            "strategy": args.strategies[seat % len(args.strategies)],
+            "net_per_round": mean,
+            "std": std,
+            "win_rate": result["seat_wins"][seat] / rounds,
+        })
+    return {
+        "house_edge": result["house"] / result["wagered"] if result["wagered"] else 0.0,
+        "house_per_round": house_mean,
+        "house_std": house_std,
+        "chips_created_per_hour": -house_mean * args.rounds_per_hour,
+        "seats": seats,
+        "truncated_hands": result["truncated"],
+    }
+
+
+def engine_benchmark(hands=200000):
+    """Hands per second dealt and scored with the game's own Shoe and Hand."""
+    shoe = Shoe(6)
+    started = time.perf_counter()
+    for _ in range(hands):
+        hand = Hand((shoe.deal(), shoe.deal()))
+        while hand.total < DEALER_STANDS:
+            hand.add(shoe.deal())
+        shoe.end_round()
+    return hands / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the blackjack payout rules and benchmark hand evaluation.")
+    parser.add_argument("--rounds", type=int, default=1000000, help="Rounds to play")
+    parser.add_argument("--players", type=int, default=4, help="Seats at the table")
+    parser.add_argument("--strategies", default="basic", help=f"Comma separated, cycled across seats: {', '.join(STRATEGIES)}")
+    parser.add_argument("--bet", type=int, default=10, help="Main bet per seat")
+    parser.add_argument("--decks", type=int, default=6, help="Decks in the shoe")
+    parser.add_argument("--rules", default="double,insurance,check", help=f"Optional plays the players make: {', '.join(RULES)}")
+    parser.add_argument("--rounds-per-hour", type=float, default=30, help="Rounds a busy channel plays per hour")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes to simulate on")
+    parser.add_argument("--chunk", type=int, default=50000, help="Rounds per task")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-compare", action="store_true", help="Skip re-running with each rule turned off")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+    args.strategies = [name.strip() for name in args.strategies.split(",") if name.strip()]
+    rules = {name.strip() for name in args.rules.split(",") if name.strip()}
+    unknown = (set(args.strategies) - set(STRATEGIES)) | (rules - set(RULES))
+    if unknown:
+        parser.error(f"Unknown strategies or rules: {', '.join(sorted(unknown))}")
+
+    report = {"players": args.players, "strategies": args.strategies, "rules": sorted(rules)}
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        started = time.perf_counter()
+        result = run(args, rules, pool)
+        elapsed = time.perf_counter() - started
+        report.update(summarize(result, args))
+        report["hands_per_second"] = result["hands"] / elapsed
+        report["elapsed_s"] = elapsed
+
+        # Same cards with one rule dropped at a time, to see what each rule does to the edge and variance
+        report["without_rule"] = {}
+        if not args.no_compare:
+            for rule in sorted(rules):
+                summary = summarize(run(args, rules - {rule}, pool), args)
+                report["without_rule"][rule] = {
+                    "house_edge": summary["house_edge"],
+                    "house_std": summary["house_std"],
+                }
+    report["engine_hands_per_second"] = engine_benchmark()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"🃏 {args.rounds:,} rounds x {args.players} seats in {elapsed:.1f}s "
+          f"({report['hands_per_second'] * 60:,.0f} hands/min, {args.workers} workers)")
+    print(f"   House edge: {report['house_edge']:+.2%} of chips wagered | "
+          f"{report['house_per_round']:+.2f} chips/round (std {report['house_std']:.1f})")
+    print(f"   Chips created per hour at {args.rounds_per_hour:g} rounds/h: {report['chips_created_per_hour']:+,.0f}")
+    for seat, stats in enumerate(report["seats"], 1):
+        print(f"   Seat {seat} ({stats['strategy']}): {stats['net_per_round']:+.2f} chips/round, "
+              f"std {stats['std']:.1f}, wins {stats['win_rate']:.1%}")
+    for rule, stats in report["without_rule"].items():
+        print(f"   Without {rule}: edge {stats['house_edge']:+.2%} ({stats['house_edge'] - report['house_edge']:+.2%}), "
+              f"std {stats['house_std']:.1f} ({stats['house_std'] - report['house_std']:+.1f})")
+    if report["truncated_hands"]:
+        print(f"   ⚠️ {report['truncated_hands']} hands stopped at {MAX_HITS} hits")
+    print(f"   Engine (Shoe + Hand, one core): {report['engine_hands_per_second']:,.0f} hands/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+from blackjack_cards import Hand, Shoe
+
+
+class BlackjackTable:
+    """Everything one blackjack table needs: its shoe, hands, bets, pot and phase.
+
+    Slotted and holding only bytearray cards, so a table costs a few
+    kilobytes and hundreds can run side by side in one process.
+    """
+
+    __slots__ = ("key", "shoe", "phase", "dealer_hand", "hands", "bets", "insurance", "pot", "settled")
+
+    def __init__(self, key, decks=6, penetration=0.75):
+        self.key = key
+        self.shoe = Shoe(decks, penetration)  # Kept between games, reshuffled at the cut card
+        self.phase = None  # None between games, then "betting" and "playing"
+        self.dealer_hand = Hand()
+        self.hands = {}  # Username -> Hand
+        self.bets = {}  # Username -> chips on the main bet
+        self.insurance = {}  # Username -> chips on insurance
+        self.pot = 0
+        self.settled = None  # (outcome, values) of the last settled round, until it has been announced
+
+    @property
+    def active(self):
+        return self.phase is not None
+
+    def reset(self):
+        """Clear the table for a new game, the last game's cards go to the discard pile."""
+        self.shoe.end_round()
+        self.phase = "betting"
+        self.dealer_hand = Hand()
+        self.hands = {}
+        self.bets = {}
+        self.insurance = {}
+        self.pot = 0
+
+    def deal(self):
+        return self.shoe.deal()
+
+    def end(self):
+        self.phase = None
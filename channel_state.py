@@ -0,0 +1,21 @@
+from collections import deque
+from blackjack_game import BlackjackGame
+from twitch_rpg_game import RPGHandler
+
+
+class ChannelState:
+    """Everything the bot keeps per channel: AI queue, cooldowns, history and games."""
+
+    def __init__(self, name, ai_scheduler, user_cooldowns, db_path="blackjack.db", max_history=5,
+                 ledger_flush_interval=None, blackjack=None):
+        self.name = name
+        self.ai_scheduler = ai_scheduler  # This channel's queue of AI requests
+        self.user_cooldowns = user_cooldowns  # Per-user AI cooldowns in this channel
+        self.recent_messages = deque(maxlen=max_history)  # Track conversation history
+        self.shed_notices = []  # (reason, request) for dropped AI requests not yet announced
+        self.shed_notice_task = None  # Sends them as one combined line per reason
+
+        # Blackjack keeps a separate table per channel, so one game can be shared by every channel
+        self.blackjack = blackjack or BlackjackGame(db_path, ledger_flush_interval)
+        # RPG battles are per channel so a battle in one channel can't touch another
+        self.rpg_handler = RPGHandler(db_path)
@@ -0,0 +1,211 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+
+# Priority lanes, lower numbers are served first
+LANE_BROADCASTER = 0
+LANE_MODERATOR = 1
+LANE_SUBSCRIBER = 2
+LANE_VIEWER = 3
+LANE_NAMES = {
+    LANE_BROADCASTER: "broadcaster",
+    LANE_MODERATOR: "moderator",
+    LANE_SUBSCRIBER: "subscriber",
+    LANE_VIEWER: "viewer",
+}
+
+
+def lane_for(chatter):
+    """Pick the priority lane for a twitchio chatter based on their badges."""
+    if getattr(chatter, "is_broadcaster", False):
+        return LANE_BROADCASTER
+    if getattr(chatter, "is_mod", False):
+        return LANE_MODERATOR
+    if getattr(chatter, "is_subscriber", False):
+        return LANE_SUBSCRIBER
+    return LANE_VIEWER
+
+
+class QueuedRequest:
+    """A single request waiting in the scheduler."""
+
+    __slots__ = ("user", "lane", "payload", "enqueued_at")
+
+    def __init__(self, user, lane, payload):
+        self.user = user
+        self.lane = lane
+        self.payload = payload
+        self.enqueued_at = time.monotonic()
+
+    def age(self, now=None):
+        """Seconds this request has been waiting."""
+        return (now if now is not None else time.monotonic()) - self.enqueued_at
+
+
+class ChatScheduler:
+    """Fair, priority-aware queue for AI requests.
+
+    Requests are grouped per user inside each lane and served round-robin, so
+    one chatty user can't starve everyone else. Nothing is dropped silently:
+    every shed request is handed to ``on_shed`` with a reason.
+    """
+
+    def __init__(self, max_depth=50, max_per_user=2, max_age=90, on_shed=None, ready=None):
+        self.max_depth = max_depth  # Total requests allowed to wait at once
+        self.max_per_user = max_per_user  # Requests a single user may have waiting
+        self.max_age = max_age  # Seconds before a waiting request is considered stale
+        self.on_shed = on_shed  # Coroutine called as on_shed(request, reason)
+
+        self.lanes = {lane: OrderedDict() for lane in sorted(LANE_NAMES)}  # lane -> user -> deque of requests
+        self.depth = 0
+        self._ready = ready or asyncio.Event()  # Set whenever a request is added, may be shared by a SchedulerGroup
+
+        # Stats
+        self.accepted = 0
+        self.served = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.shed_counts = {"queue_full": 0, "user_limit": 0, "displaced": 0, "expired": 0}
+
+    async def put(self, user, payload, lane=LANE_VIEWER):
+        """Queue a request. Returns None if accepted, otherwise the shed reason."""
+        request = QueuedRequest(user, lane, payload)
+        user_queue = self.lanes[lane].get(user)
+
+        if user_queue is not None and len(user_queue) >= self.max_per_user:
+            await self._shed(request, "user_limit")
+            return "user_limit"
+
+        if self.depth >= self.max_depth:
+            # Make room by bumping the newest request from the lowest lane, if it's below this one
+            displaced = self._pop_lowest(below=lane)
+            if displaced is None:
+                await self._shed(request, "queue_full")
+                return "queue_full"
+            await self._shed(displaced, "displaced")
+
+        self.lanes[lane].setdefault(user, deque()).append(request)
+        self.depth += 1
+        self.accepted += 1
+        self._ready.set()
+        return None
+
+    async def get(self):
+        """Wait for the next request."""
+        while True:
+            self._ready.clear()
+            request = await self.poll()
+            if request is not None:
+                return request
+            await self._ready.wait()
+
+    async def poll(self):
+        """Return the next request without waiting, dropping any that have gone stale. None if empty."""
+        while True:
+            request = self._pop_next()
+            if request is None:
+                return None
+
+            wait = request.age()
+            if self.max_age and wait > self.max_age:
+                await self._shed(request, "expired")
+                continue
+
+            self.served += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            return request
+
+    def _pop_next(self):
+        """Take the next request from the highest-priority lane, rotating through its users."""
+        for users in self.lanes.values():
+            if not users:
+                continue
+            user, user_queue = users.popitem(last=False)
+            request = user_queue.popleft()
+            if user_queue:
+                users[user] = user_queue  # Back of the line for this user's next request
+            self.depth -= 1
+            return request
+        return None
+
+    def _pop_lowest(self, below):
+        """Remove the newest request from the lowest lane that ranks below `below`."""
+        for lane in sorted(self.lanes, reverse=True):
+            if lane <= below:
+                break
+            users = self.lanes[lane]
+            if not users:
+                continue
+            user = next(reversed(users))
+            user_queue = users[user]
+            request = user_queue.pop()
+            if not user_queue:
+                del users[user]
+            self.depth -= 1
+            return request
+        return None
+
+    async def _shed(self, request, reason):
+        """Count a dropped request and let the owner know about it."""
+        self.shed_counts[reason] += 1
+        if self.on_shed is not None:
+            try:
+                await self.on_shed(request, reason)
+            except Exception as e:
+                print(f"⚠️ Error reporting shed request: {e}")
+
+    def oldest_wait(self):
+        """Age in seconds of the longest-waiting request."""
+        now = time.monotonic()
+        ages = [queue[0].age(now) for users in self.lanes.values() for queue in users.values()]
+        return max(ages, default=0.0)
+
+    def stats(self):
+        """Queue depth, wait times and shed counts for monitoring."""
+        return {
+            "depth": self.depth,
+            "depth_by_lane": {
+                LANE_NAMES[lane]: sum(len(queue) for queue in users.values())
+                for lane, users in self.lanes.items()
+            },
+            "accepted": self.accepted,
+            "served": self.served,
+            "avg_wait": self.total_wait / self.served if self.served else 0.0,
+            "max_wait": self.max_wait,
+            "oldest_wait": self.oldest_wait(),
+            "shed": dict(self.shed_counts),
+        }
+
+
+class SchedulerGroup:
+    """One ChatScheduler per channel, drained round-robin by a shared pool of workers."""
+
+    def __init__(self, **scheduler_options):
+        self.scheduler_options = scheduler_options  # Passed to every ChatScheduler
+        self.schedulers = OrderedDict()  # Channel name -> ChatScheduler, next channel to serve first
+        self._ready = asyncio.Event()  # Shared by all schedulers in the group
+
+    def scheduler(self, name):
+        """Get the scheduler for a channel, creating it on first use."""
+        scheduler = self.schedulers.get(name)
+        if scheduler is None:
+            scheduler = ChatScheduler(ready=self._ready, **self.scheduler_options)
+            self.schedulers[name] = scheduler
+        return scheduler
+
+    async def get(self):
+        """Wait for the next request from any channel, taking turns between channels."""
+        while True:
+            self._ready.clear()
+            for _ in range(len(self.schedulers)):
+                name, scheduler = next(iter(self.schedulers.items()))
+                self.schedulers.move_to_end(name)
+                request = await scheduler.poll()
+                if request is not None:
+                    return request
+            await self._ready.wait()
+
+    def stats(self):
+        """Per-channel scheduler stats."""
+        return {name: scheduler.stats() for name, scheduler in self.schedulers.items()}
@@ -0,0 +1,167 @@
+import asyncio
+import time
+
+# Twitch chat limits per account type as (messages, per seconds)
+RATE_LIMITS = {
+    "normal": (20, 30),
+    "moderator": (100, 30),
+    "verified": (7500, 30),
+}
+
+# The limits apply to the bot account across every channel, so every sender in a process shares one bucket
+_account_buckets = {}
+
+
+def split_message(text, limit=450):
+    """Split text into chunks of up to `limit` characters without splitting words."""
+    if len(text) <= limit:
+        return [text]
+
+    chunks = []
+    current_chunk = ""
+    for word in text.split():
+        if len(current_chunk) + len(word) + 1 > limit:  # +1 for the space
+            if current_chunk:
+                chunks.append(current_chunk)
+            # Hard-split any single word that is longer than the limit
+            while len(word) > limit:
+                chunks.append(word[:limit])
+                word = word[limit:]
+            current_chunk = word
+        else:
+            current_chunk += (" " if current_chunk else "") + word
+
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+
+class StreamSplitter:
+    """Turns streamed text into word-aligned chat chunks as soon as each one is complete."""
+
+    def __init__(self, limit=450):
+        self.limit = limit
+        self.buffer = ""
+
+    def feed(self, text):
+        """Add streamed text. Returns the chunks that are ready to send."""
+        self.buffer += text
+        chunks = []
+        while len(self.buffer) > self.limit:
+            # Cut at the last space that fits, or hard-cut a single huge word
+            cut = self.buffer.rfind(" ", 0, self.limit + 1)
+            if cut <= 0:
+                cut = self.limit
+            chunk = self.buffer[:cut].strip()
+            if chunk:
+                chunks.append(chunk)
+            self.buffer = self.buffer[cut:].lstrip()
+        return chunks
+
+    def flush(self):
+        """Return whatever is left once the stream has ended."""
+        chunks = [" ".join(self.buffer.split())] if self.buffer.strip() else []
+        self.buffer = ""
+        return chunks
+
+
+class TokenBucket:
+    """Token bucket that never lets more than `limit` messages through in any `per` second window.
+
+    Half the limit is available as an instant burst, the other half refills
+    evenly over the window, so burst + refill always stays within the limit.
+    """
+
+    def __init__(self, limit, per):
+        self.capacity = max(1, limit // 2)
+        self.rate = (limit - self.capacity) / per  # Tokens added per second
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        """Seconds until a token is available, 0 if one is available now."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        """Take a token, waiting only if the bucket is empty."""
+        while True:
+            wait = self.delay()
+            if wait <= 0:
+                self.tokens -= 1
+                return
+            await asyncio.sleep(wait)
+
+
+def account_bucket(account_type, processes=1):
+    """The process-wide bucket for the bot account, its limit split evenly across `processes` workers."""
+    key = (account_type, processes)
+    bucket = _account_buckets.get(key)
+    if bucket is None:
+        limit, per = RATE_LIMITS[account_type]
+        bucket = _account_buckets[key] = TokenBucket(max(1, limit // processes), per)
+    return bucket
+
+
+class ChannelSender:
+    """Sends messages to one channel in order, paced by its own token bucket and the account's."""
+
+    def __init__(self, channel, bucket, account_bucket=None):
+        self.channel = channel
+        self.bucket = bucket
+        self.account_bucket = account_bucket  # Shared with every other channel the account talks in
+        self._lock = asyncio.Lock()  # Keeps messages in the order they were sent
+        self.pending = 0  # Messages waiting for a token
+        self.sent = 0
+
+    async def send(self, text):
+        """Send a message, splitting it into 450 character chunks if needed."""
+        for chunk in split_message(text):
+            self.pending += 1
+            try:
+                async with self._lock:
+                    await self.bucket.acquire()
+                    if self.account_bucket is not None:
+                        await self.account_bucket.acquire()
+                    await self.channel.send(chunk)
+                    self.sent += 1
+            finally:
+                self.pending -= 1
+
+
+class ChatSender:
+    """One outbound send scheduler per channel, sized to the bot account's rate limit.
+
+    Every channel also draws from one account-wide bucket shared by all
+    connections in the process. With `processes` workers each gets an even
+    share of the account's limit.
+    """
+
+    def __init__(self, account_type="normal", processes=1):
+        if account_type not in RATE_LIMITS:
+            print(f"⚠️ Unknown Twitch account type '{account_type}', using 'normal' rate limits")
+            account_type = "normal"
+        self.account_type = account_type
+        self.account_bucket = account_bucket(account_type, max(1, processes))
+        self.senders = {}  # Channel name -> ChannelSender
+
+    def get_sender(self, channel):
+        """Get the sender for a channel, creating it on first use."""
+        sender = self.senders.get(channel.name)
+        if sender is None:
+            sender = ChannelSender(channel, TokenBucket(*RATE_LIMITS[self.account_type]), self.account_bucket)
+            self.senders[channel.name] = sender
+        else:
+            sender.channel = channel  # Keep the freshest channel object
+        return sender
+
+    async def send(self, channel, text):
+        """Send a message to a channel through its rate limited sender."""
+        await self.get_sender(channel).send(text)
@@ -0,0 +1,70 @@
+import time
+from collections import OrderedDict, deque
+
+
+class CooldownStore:
+    """Bounded per-user cooldown and rate-limit tracker.
+
+    Entries are kept in least-recently-used order with monotonic timestamps,
+    so expired users are evicted from the front in O(1) and the store never
+    grows past `max_entries`. Supports a simple cooldown between requests
+    and an optional sliding window of `window_limit` requests per
+    `window_seconds`.
+    """
+
+    def __init__(self, cooldown_seconds=10, window_limit=None, window_seconds=None, max_entries=10000, ttl=None):
+        self.cooldown_seconds = cooldown_seconds
+        self.window_limit = window_limit
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        # Entries older than this can no longer affect any limit
+        self.ttl = ttl or max(cooldown_seconds, window_seconds or 0)
+        self.entries = OrderedDict()  # Key -> deque of recent request times, oldest user first
+
+    def _evict(self, now):
+        """Drop users whose last request is older than the TTL, then enforce the size cap."""
+        while self.entries:
+            key, times = next(iter(self.entries.items()))
+            if now - times[-1] < self.ttl:
+                break
+            del self.entries[key]
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def retry_after(self, key, now=None):
+        """Seconds the key must wait before its next request, 0 if it may go now."""
+        now = time.monotonic() if now is None else now
+        times = self.entries.get(key)
+        if not times:
+            return 0.0
+
+        wait = self.cooldown_seconds - (now - times[-1])
+        if self.window_limit and len(times) >= self.window_limit:
+            wait = max(wait, self.window_seconds - (now - times[0]))
+        return max(0.0, wait)
+
+    def hit(self, key, now=None):
+        """Record a request for the key."""
+        now = time.monotonic() if now is None else now
+        times = self.entries.pop(key, None)
+        if times is None:
+            times = deque(maxlen=self.window_limit or 1)
+        times.append(now)
+        self.entries[key] = times  # Most recently used at the end
+        self._evict(now)
+
+    def try_acquire(self, key):
+        """Record a request if allowed. Returns 0 on success, otherwise the seconds left to wait."""
+        now = time.monotonic()
+        wait = self.retry_after(key, now)
+        if wait > 0:
+            return wait
+        self.hit(key, now)
+        return 0.0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class ConnectionManager:
+    """Reusable, tuned SQLite connections for one database file, one per thread.
+
+    Connections stay open for the life of the thread, so a command no longer
+    pays for connecting, and their statement caches keep queries prepared.
+    WAL journaling lets readers (the RPG handler, the website) run while a
+    game is writing.
+    """
+
+    def __init__(self, db_path, cache_size_kb=8192, busy_timeout_ms=5000, cached_statements=256):
+        self.db_path = db_path
+        self.cache_size_kb = cache_size_kb  # Page cache per connection
+        self.busy_timeout_ms = busy_timeout_ms  # How long to wait on a locked database before failing
+        self.cached_statements = cached_statements  # Prepared statements kept per connection
+        self._local = threading.local()
+        self._connections = []  # Every connection opened, so close_all() can reach other threads' ones
+        self._lock = threading.Lock()
+
+    def connection(self):
+        """This thread's connection, opened and tuned on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread is off only so close_all() (Bot.close) can close it from the DB thread, each thread uses its own
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000,
+                                   cached_statements=self.cached_statements, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL, skips an fsync per commit
+            conn.execute(f"PRAGMA cache_size=-{self.cache_size_kb}")
+            conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Yield this thread's connection, committing on success and rolling back on error.
+
+        On a thread in group commit mode the block runs in a savepoint of the
+        group's transaction instead, and is committed later with the rest.
+        """
+        conn = self.connection()
+        group_limit = getattr(self._local, "group_limit", None)
+        if group_limit is None:
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+            return
+
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        conn.execute("SAVEPOINT operation")
+        try:
+            yield conn
+        except BaseException:
+            # Undo only this block, the rest of the group stays
+            conn.execute("ROLLBACK TO operation")
+            conn.execute("RELEASE operation")
+            raise
+        conn.execute("RELEASE operation")
+        self._local.group_pending += 1
+        if self._local.group_pending >= group_limit:
+            self.commit_group()
+
+    def start_group_commit(self, max_pending):
+        """Make transaction() on this thread join one long transaction, committed by commit_group()
+        or once `max_pending` blocks are waiting."""
+        self._local.group_limit = max_pending
+        self._local.group_pending = 0
+
+    def commit_group(self):
+        """Commit this thread's open group transaction. Returns how many blocks it held."""
+        conn = self.connection()
+        pending = getattr(self._local, "group_pending", 0)
+        if conn.in_transaction:
+            conn.commit()
+        self._local.group_pending = 0
+        return pending
+
+    def close_all(self):
+        """Close every connection this manager has opened."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                print(f"⚠️ Error closing SQLite connection: {e}")
+        self._local = threading.local()
+
+
+def per_database(factory):
+    """Make a `get(db_path, ...)` that returns one shared `factory(db_path, ...)` per database file.
+
+    The instance is created on first use, later arguments are ignored. `get.items()`
+    lists (absolute path, instance) pairs, for metrics callbacks.
+    """
+    instances = {}
+    lock = threading.Lock()
+
+    def get(db_path, *args, **kwargs):
+        key = os.path.abspath(db_path)
+        with lock:
+            instance = instances.get(key)
+            if instance is None:
+                instance = instances[key] = factory(db_path, *args, **kwargs)
+            return instance
+
+    def items():
+        with lock:
+            return list(instances.items())
+
+    get.items = items
+    return get
+
+
+# Shared by the games, the website and anything else opening the same file
+get_connection_manager = per_database(ConnectionManager)
@@ -0,0 +1,42 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from db_connections import per_database
+from metrics import registry as metrics
+
+
+class DBWorker:
+    """Runs blocking SQLite work on a dedicated thread so the event loop never waits on disk.
+
+    Calls are queued and run one at a time, in order, so game state that is
+    only touched through the worker never needs its own locking.
+    """
+
+    def __init__(self, name="sqlite"):
+        self.name = name
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"db-{name}")
+        self.pending = 0  # Calls queued or running
+
+    async def call(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) on the DB thread and wait for its result."""
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+        finally:
+            self.pending -= 1
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+# Every game object using a file queues on the same thread, so its writes stay in order
+get_db_worker = per_database(lambda db_path: DBWorker(os.path.basename(db_path)))
+
+
+def _pending_samples():
+    return [({"database": worker.name}, worker.pending) for _, worker in get_db_worker.items()]
+
+
+metrics.gauge("db_worker_pending", "SQLite calls waiting for or running on the DB thread").add_callback(_pending_samples)
@@ -0,0 +1,121 @@
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# Every Lazy created, in creation order, so warmup() can build them ahead of first use
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class Lazy:
+    """A heavy client (Gemini model, TTS engine, the bot...) built by `factory` on first use.
+
+    Attribute access is passed through to the built object, so a module-level
+    `model = Lazy("gemini", make_model)` can be used exactly like the model.
+    Importing the module costs nothing; the first call pays for the factory,
+    or warmup() can pay for it at a convenient time.
+    """
+
+    def __init__(self, name, factory):
+        self._name = name
+        self._factory = factory
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.load_seconds = None  # How long the factory took
+        with _registry_lock:
+            _registry[name] = self
+
+    def get(self):
+        """The object, built on the first call."""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    started = time.perf_counter()
+                    self._value = self._factory()
+                    self.load_seconds = time.perf_counter() - started
+                    self._loaded = True
+        return self._value
+
+    def set(self, value):
+        """Use `value` instead of building one."""
+        with self._lock:
+            self._value = value
+            self._loaded = True
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __repr__(self):
+        state = f"loaded in {self.load_seconds * 1000:.0f}ms" if self.load_seconds is not None else (
+            "set" if self._loaded else "not loaded")
+        return f"<Lazy {self._name}: {state}>"
+
+
+def warmup(*names):
+    """Build the named components (all of them by default) now. Returns {name: seconds, or the error}."""
+    with _registry_lock:
+        components = [(name, lazy) for name, lazy in _registry.items() if not names or name in names]
+    results = {}
+    for name, lazy in components:
+        try:
+            lazy.get()
+            results[name] = lazy.load_seconds or 0.0
+            print(f"🔥 Warmed up {name} in {results[name] * 1000:.0f}ms")
+        except Exception as e:
+            # Left unloaded, so the first real use tries again
+            results[name] = e
+            print(f"⚠️ Could not warm up {name}: {e}")
+    return results
+
+
+def import_profile(module, python=sys.executable):
+    """Import `module` in a fresh interpreter with -X importtime. Returns [(cumulative us, self us, module)]."""
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env={**os.environ, "PYTHONWARNINGS": "ignore"}
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if self_us.isdigit():
+            rows.append((int(cumulative_us), int(self_us), name))
+    if result.returncode != 0:
+        print(f"⚠️ Importing {module} failed: {result.stderr.strip().splitlines()[-1]}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show what importing each module costs, and what warming it up costs.")
+    parser.add_argument("modules", nargs="*", default=["suzu_api", "suzu_chat_api", "suzu_twitch_api_server", "blackjack_game"])
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list per module")
+    parser.add_argument("--warmup", action="store_true", help="Also import the modules here and time each lazy component")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        rows = import_profile(module)
+        if not rows:
+            continue
+        total = next((cumulative for cumulative, _, name in rows if name == module), max(rows)[0])
+        print(f"📦 {module}: {total / 1000:.0f}ms to import")
+        for cumulative, self_us, name in sorted(rows, reverse=True)[1:args.top + 1]:
+            print(f"   {cumulative / 1000:8.1f}ms  (self {self_us / 1000:6.1f}ms)  {name.strip()}")
+
+    if args.warmup:
+        for module in args.modules:
+            __import__(module)
+        # The modules registered their components with the imported `lazy`, not this __main__ copy
+        __import__("lazy").warmup()
+
+
+if __name__ == "__main__":
+    main()
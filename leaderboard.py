@@ -0,0 +1,86 @@
+import threading
+import time
+from sortedcontainers import SortedList
+from db_connections import per_database
+
+
+class Leaderboard:
+    """In-memory chip ranking kept up to date on every balance change.
+
+    Players are held in a SortedList of (-chips, username), which keeps its
+    items in small sublists with a positional index, so a balance change,
+    a rank lookup and finding a page are all O(log n) instead of a table
+    scan and sort.
+    """
+
+    def __init__(self, refresh_seconds=300):
+        self.refresh_seconds = refresh_seconds  # Reload from disk this often to pick up other processes' writes
+        self.ranking = SortedList()  # (-chips, username)
+        self.chips = {}  # Username -> chips
+        self.results = {}  # Username -> [wins, losses]
+        self.loaded_at = None
+        self._lock = threading.RLock()
+
+    def load(self, conn):
+        """(Re)build the ranking from the users table, read in ranking order through idx_users_ranking."""
+        rows = conn.execute(
+            "SELECT username, chips, wins, losses FROM users ORDER BY chips DESC, username"
+        ).fetchall()
+        with self._lock:
+            self.chips = {username: chips for username, chips, _, _ in rows}
+            self.results = {username: [wins or 0, losses or 0] for username, _, wins, losses in rows}
+            # Already in order, so the sort inside SortedList is a single linear pass
+            self.ranking = SortedList((-chips, username) for username, chips, _, _ in rows)
+            self.loaded_at = time.monotonic()
+
+    def is_stale(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.refresh_seconds
+
+    def set_chips(self, username, chips):
+        """Move a player to their new balance."""
+        with self._lock:
+            old = self.chips.get(username)
+            if old == chips:
+                return
+            if old is not None:
+                self.ranking.discard((-old, username))
+            else:
+                self.results.setdefault(username, [0, 0])
+            self.ranking.add((-chips, username))
+            self.chips[username] = chips
+
+    def adjust_chips(self, username, amount):
+        """Apply a balance change when only the difference is known."""
+        with self._lock:
+            if username in self.chips:
+                self.set_chips(username, self.chips[username] + amount)
+
+    def record_result(self, username, result):
+        with self._lock:
+            results = self.results.get(username)
+            if results is not None:
+                if result == "win":
+                    results[0] += 1
+                elif result == "loss":
+                    results[1] += 1
+
+    def top(self, limit=5, offset=0):
+        """One page of the ranking as (username, chips, wins, losses)."""
+        with self._lock:
+            page = self.ranking[offset:offset + limit]
+            return [(username, -negative_chips, *self.results.get(username, (0, 0))) for negative_chips, username in page]
+
+    def rank(self, username):
+        """(1-based rank, players ranked, chips), or None for unknown players."""
+        with self._lock:
+            chips = self.chips.get(username)
+            if chips is None:
+                return None
+            return self.ranking.bisect_left((-chips, username)) + 1, len(self.ranking), chips
+
+    def __len__(self):
+        return len(self.ranking)
+
+
+# Every blackjack table and the RPG move chips in the same ranking
+get_shared_leaderboard = per_database(lambda db_path: Leaderboard())
@@ -0,0 +1,172 @@
+import argparse
+import gzip
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from db_connections import get_connection_manager, per_database
+from metrics import registry as metrics
+
+ARCHIVED_ROWS = metrics.counter("ledger_archived_rows_total", "Transactions rows moved to archive files")
+
+
+def ensure_schema(conn):
+    """Create the ledger index and the monthly rollup table if they don't exist."""
+    # Serves the daily-claim lookup and any per-user history query without a scan
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_transactions_user_type_time ON transactions(username, type, timestamp)"
+    )
+    # Archived rows live on as one total per user, type and month
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS transaction_rollups (
+        username TEXT,
+        type TEXT,
+        month TEXT,
+        total INTEGER DEFAULT 0,
+        count INTEGER DEFAULT 0,
+        PRIMARY KEY (username, type, month)
+    )
+    ''')
+    conn.commit()
+
+
+class LedgerArchiver:
+    """Moves old transactions rows out of the hot database.
+
+    Rows older than `retain_days` are appended to gzipped JSON lines files,
+    one per month, folded into `transaction_rollups`, and deleted. Each batch
+    is its own short transaction, so the bot keeps writing while it runs.
+    Only rows a batch actually deleted are archived, so archivers running at
+    the same time (several processes, or the CLI during the hourly run)
+    never count a row twice.
+    """
+
+    def __init__(self, db_path, archive_dir="ledger_archive", retain_days=90, batch_size=5000,
+                 interval=3600, pause=0.05):
+        self.db = get_connection_manager(db_path)
+        self.archive_dir = archive_dir
+        self.retain_days = retain_days  # Rows newer than this stay in the database
+        self.batch_size = batch_size  # Rows moved per transaction
+        self.interval = interval  # Seconds between runs of the background thread
+        self.pause = pause  # Seconds to yield to the bot between batches
+        self._stop = threading.Event()
+        self._thread = None
+
+    def cutoff(self):
+        """Timestamps before this are archived, in the format of SQLite's CURRENT_TIMESTAMP."""
+        return (datetime.now(timezone.utc) - timedelta(days=self.retain_days)).strftime("%Y-%m-%d %H:%M:%S")
+
+    def archive_batch(self, cutoff):
+        """Archive up to batch_size rows older than cutoff. Returns how many were moved."""
+        with self.db.transaction() as conn:
+            # Take the write lock up front, a second archiver waits here and then only finds what is left
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "DELETE FROM transactions WHERE id IN "
+                "(SELECT id FROM transactions WHERE timestamp < ? ORDER BY id LIMIT ?) "
+                "RETURNING id, username, amount, type, timestamp",
+                (cutoff, self.batch_size)
+            ).fetchall()
+            if not rows:
+                return 0
+            self._archive_rows(conn, rows)
+
+        ARCHIVED_ROWS.inc(len(rows))
+        return len(rows)
+
+    def _archive_rows(self, conn, rows):
+        """Write deleted rows to the monthly files and add them to the rollups, before the delete commits."""
+        rows.sort()
+        by_month = defaultdict(list)
+        rollups = defaultdict(lambda: [0, 0])
+        for row in rows:
+            _, username, amount, kind, timestamp = row
+            month = timestamp[:7]
+            by_month[month].append(row)
+            totals = rollups[(username, kind, month)]
+            totals[0] += amount or 0
+            totals[1] += 1
+
+        # Files before the commit: a crash in between only means a row is archived twice, never lost
+        os.makedirs(self.archive_dir, exist_ok=True)
+        for month, month_rows in by_month.items():
+            path = os.path.join(self.archive_dir, f"transactions-{month}.jsonl.gz")
+            with gzip.open(path, "at", encoding="utf-8") as f:
+                for row_id, username, amount, kind, timestamp in month_rows:
+                    f.write(json.dumps({"id": row_id, "username": username, "amount": amount,
+                                        "type": kind, "timestamp": timestamp}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+        conn.executemany(
+            "INSERT INTO transaction_rollups (username, type, month, total, count) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(username, type, month) DO UPDATE SET "
+            "total = total + excluded.total, count = count + excluded.count",
+            [(username, kind, month, total, count) for (username, kind, month), (total, count) in rollups.items()]
+        )
+
+    def archive(self):
+        """Archive everything older than retain_days, batch by batch. Returns how many rows were moved."""
+        ensure_schema(self.db.connection())
+        cutoff = self.cutoff()
+        total = 0
+        while not self._stop.is_set():
+            moved = self.archive_batch(cutoff)
+            total += moved
+            if moved < self.batch_size:
+                break
+            time.sleep(self.pause)
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                moved = self.archive()
+                if moved:
+                    print(f"🗄️ Archived {moved} ledger rows older than {self.retain_days} days")
+            except Exception as e:
+                print(f"⚠️ Error archiving ledger rows, will retry: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Run archive() now and every `interval` seconds on a background thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ledger-archive", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+# Every bot connection in a process shares one archive thread
+get_ledger_archiver = per_database(LedgerArchiver)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old blackjack ledger rows into monthly rollups and gzip files.")
+    parser.add_argument("--db", default="blackjack.db", help="Database to archive")
+    parser.add_argument("--dir", default="ledger_archive", help="Where to write the archive files")
+    parser.add_argument("--days", type=int, default=90, help="Keep rows newer than this many days")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows moved per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many rows would be archived")
+    args = parser.parse_args()
+
+    archiver = LedgerArchiver(args.db, args.dir, args.days, args.batch_size)
+    if args.dry_run:
+        conn = archiver.db.connection()
+        count = conn.execute("SELECT COUNT(*) FROM transactions WHERE timestamp < ?", (archiver.cutoff(),)).fetchone()[0]
+        print(f"🗄️ {count} ledger rows are older than {args.days} days")
+        return
+
+    started = time.perf_counter()
+    moved = archiver.archive()
+    print(f"🗄️ Archived {moved} ledger rows to {args.dir} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import atexit
+import threading
+import time
+from db_connections import get_connection_manager, per_database
+from db_worker import get_db_worker
+from metrics import registry as metrics
+
+FLUSH_SECONDS = metrics.histogram("ledger_flush_seconds", "Time to commit one group of chip operations")
+FLUSHED_ROWS = metrics.counter("ledger_flushed_rows_total", "Chip operations committed by the journal in groups")
+
+
+class LedgerJournal:
+    """Group commit for chip operations on the database's DB worker thread.
+
+    While it runs, every transaction() on the worker thread (a balance change
+    with its ledger rows, a stats update...) becomes a savepoint in one long
+    transaction, committed every `flush_interval` seconds or once
+    `max_pending` operations are waiting. A busy table pays for one commit
+    per group instead of one per chip movement, and a balance and its ledger
+    row still always commit together. At most `flush_interval` seconds of
+    whole operations can be lost in a crash, and other processes writing to
+    the database wait up to that long for the lock.
+    """
+
+    def __init__(self, db_path, flush_interval=1.0, max_pending=200):
+        self.db = get_connection_manager(db_path)
+        self.worker = get_db_worker(db_path)
+        self.flush_interval = flush_interval  # Durability window in seconds
+        self.max_pending = max_pending  # Commit early once this many operations are waiting
+        self._worker_thread = None  # Ident of the DB worker thread, once group commit is on there
+        self._worker_conn = None  # Its connection, for the final commit after the worker has shut down
+        self._closed = threading.Event()
+        # Queued ahead of any game call made after this, so every one of them joins a group
+        self.worker.executor.submit(self._start)
+        self._thread = threading.Thread(target=self._run, name="ledger-group-commit", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _start(self):
+        self._worker_thread = threading.get_ident()
+        self._worker_conn = self.db.connection()
+        self.db.start_group_commit(self.max_pending)
+
+    def _commit(self):
+        started = time.perf_counter()
+        committed = self.db.commit_group()
+        if committed:
+            FLUSH_SECONDS.observe(time.perf_counter() - started)
+            FLUSHED_ROWS.inc(committed)
+
+    def flush(self):
+        """Commit everything waiting, from the DB worker thread or any other."""
+        if threading.get_ident() == self._worker_thread:
+            self._commit()
+            return
+        try:
+            self.worker.executor.submit(self._commit).result(timeout=10)
+        except RuntimeError:
+            # At interpreter exit the worker thread is gone, so its connection is free to commit from here
+            if self._worker_conn is not None and self._worker_conn.in_transaction:
+                self._worker_conn.commit()
+        except Exception as e:
+            print(f"⚠️ Error committing ledger group: {e}")
+
+    def _run(self):
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.worker.executor.submit(self._commit)
+            except RuntimeError:
+                return  # The worker is shutting down
+
+    def close(self):
+        """Stop the commit timer and commit whatever is left."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+
+# Every table's chip operations go out in the same groups: get_ledger_journal(db_path, flush_interval, max_pending)
+get_ledger_journal = per_database(LedgerJournal)
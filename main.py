@@ -1,6 +1,7 @@
 import threading
 from suzu_twitch_api_server import Bot
 from suzu_api import app, set_bot_instance  # Import Flask app and set_bot_instance function
+from lazy import warmup
 
 def run_flask():
     """
@@ -17,6 +18,9 @@ def run_twitch_bot():
     bot.run()  # Start the bot
 
 if __name__ == "__main__":
+    # Load Gemini in the background so neither server waits on it at startup
+    threading.Thread(target=warmup, args=("suzu_api_gemini",), daemon=True).start()
+
     # Start the Flask server in a separate thread
     flask_thread = threading.Thread(target=run_flask)
     flask_thread.daemon = True  # Ensure the Flask thread exits when the main program exits
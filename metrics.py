@@ -0,0 +1,335 @@
+import asyncio
+import bisect
+import functools
+import threading
+import time
+
+# Histogram bucket upper bounds in seconds, from a fast SQLite read to a slow AI reply
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonically increasing count, one value per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name, help=""):
+        self.name = name
+        self.help = help
+        self.values = {}  # Label key -> count
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return list(self.values.items())
+
+
+class Gauge:
+    """Value that goes up and down. Can also be read from callbacks at collection time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help=""):
+        self.name = name
+        self.help = help
+        self.values = {}  # Label key -> value
+        self.callbacks = []  # Functions returning [(labels, value), ...] when collected
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        with self._lock:
+            self.values[_label_key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def add_callback(self, callback):
+        """Read values from `callback()` whenever metrics are collected, e.g. queue depths."""
+        self.callbacks.append(callback)
+
+    def samples(self):
+        with self._lock:
+            samples = dict(self.values)
+        for callback in self.callbacks:
+            try:
+                for labels, value in callback():
+                    samples[_label_key(labels)] = value
+            except Exception as e:
+                print(f"⚠️ Error collecting gauge {self.name}: {e}")
+        return list(samples.items())
+
+
+class Histogram:
+    """Fixed-bucket latency histogram. Observing is a bisect and three additions."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help="", buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}  # Label key -> [per-bucket counts (last is +Inf), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        """Context manager that observes how long its block took."""
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            return [(key, (list(counts), total, count)) for key, (counts, total, count) in self.series.items()]
+
+    def quantile(self, counts, q):
+        """Estimate a quantile from bucket counts by interpolating inside the bucket it falls in."""
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower  # Past the last bucket, all we know is the lower bound
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class MetricsRegistry:
+    """Named metrics for one process, rendered as Prometheus text or a JSON summary."""
+
+    def __init__(self):
+        self.metrics = {}  # Name -> metric, in registration order
+        self._lock = threading.Lock()
+        self._server = None  # aiohttp runner once start_server() has run
+
+    def _get_or_create(self, cls, name, help, **options):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help, **options)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help=""):
+        return self._get_or_create(Counter, name, help)
+
+    def gauge(self, name, help=""):
+        return self._get_or_create(Gauge, name, help)
+
+    def histogram(self, name, help="", buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help, buckets=buckets)
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if metric.kind == "histogram":
+                for key, (counts, total, count) in metric.samples():
+                    cumulative = 0
+                    for bound, bucket_count in zip(metric.buckets + (float("inf"),), counts):
+                        cumulative += bucket_count
+                        labels = _format_labels(key, [("le", _format_value(bound))])
+                        lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+                    lines.append(f"{metric.name}_sum{_format_labels(key)} {_format_value(total)}")
+                    lines.append(f"{metric.name}_count{_format_labels(key)} {count}")
+            else:
+                for key, value in metric.samples():
+                    lines.append(f"{metric.name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """JSON-friendly summary with latency percentiles in milliseconds, for charting."""
+        summary = {}
+        for metric in list(self.metrics.values()):
+            series = []
+            for key, value in metric.samples():
+                entry = {"labels": dict(key)}
+                if metric.kind == "histogram":
+                    counts, total, count = value
+                    entry.update({
+                        "count": count,
+                        "avg_ms": total / count * 1000 if count else 0.0,
+                        "p50_ms": metric.quantile(counts, 0.5) * 1000,
+                        "p95_ms": metric.quantile(counts, 0.95) * 1000,
+                        "p99_ms": metric.quantile(counts, 0.99) * 1000,
+                    })
+                else:
+                    entry["value"] = value
+                series.append(entry)
+            summary[metric.name] = {"type": metric.kind, "help": metric.help, "series": series}
+        return summary
+
+    async def start_server(self, port, host="0.0.0.0"):
+        """Serve /metrics and /metrics.json from an asyncio process (the Twitch bot). Safe to call twice."""
+        if self._server is not None:
+            return
+        from aiohttp import web
+
+        async def prometheus(request):
+            return web.Response(text=self.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+        async def json_summary(request):
+            return web.json_response(self.summary(), headers={"Access-Control-Allow-Origin": "*"})
+
+        app = web.Application()
+        app.router.add_get("/metrics", prometheus)
+        app.router.add_get("/metrics.json", json_summary)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, host, port).start()
+        except OSError as e:
+            await runner.cleanup()
+            print(f"⚠️ Could not start metrics server on port {port}: {e}")
+            return
+        self._server = runner
+        print(f"📈 Metrics available on http://{host}:{port}/metrics")
+
+    async def stop_server(self):
+        if self._server is not None:
+            await self._server.cleanup()
+            self._server = None
+
+
+# Process-wide registry used by default everywhere
+registry = MetricsRegistry()
+
+
+def timed(name, help="", registry=registry, **labels):
+    """Decorator recording a function's latency in histogram `name` and its failures in a matching error counter.
+
+    Works on plain and async functions. Without labels, the qualified function name is the `function` label.
+    """
+    histogram = registry.histogram(name, help)
+    errors = registry.counter(name[:-len("_seconds")] + "_errors_total" if name.endswith("_seconds") else name + "_errors_total",
+                              f"Exceptions raised, see {name}")
+
+    def decorator(func):
+        series = labels or {"function": func.__qualname__}
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    errors.inc(**series)
+                    raise
+                finally:
+                    histogram.observe(time.perf_counter() - started, **series)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                errors.inc(**series)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started, **series)
+        return wrapper
+
+    return decorator
+
+
+def instrument_flask(app, service, registry=registry):
+    """Time every request of a Flask app and add /metrics and /metrics.json routes to it."""
+    from flask import Response, g, jsonify, request
+
+    latency = registry.histogram("http_request_seconds", "Flask request latency by route")
+    requests_total = registry.counter("http_requests_total", "Flask requests by route and status")
+    errors = registry.counter("http_request_errors_total", "Flask requests that raised")
+    in_flight = registry.gauge("http_requests_in_flight", "Flask requests being handled")
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        in_flight.inc(service=service)
+
+    @app.after_request
+    def record_request(response):
+        # Streaming routes are timed until their first byte, the body is sent after this runs
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+            latency.observe(time.perf_counter() - started, service=service, route=endpoint, method=request.method)
+            requests_total.inc(service=service, route=endpoint, method=request.method, status=response.status_code)
+        return response
+
+    @app.teardown_request
+    def finish_request(exc):
+        in_flight.dec(service=service)
+        if exc is not None:
+            endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+            errors.inc(service=service, route=endpoint, method=request.method)
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics_prometheus():
+        return Response(registry.render_prometheus(), mimetype="text/plain")
+
+    @app.route("/metrics.json", methods=["GET"])
+    def metrics_json():
+        return jsonify(registry.summary())
+
+    return app
@@ -0,0 +1,212 @@
+import asyncio
+import os
+import random
+import string
+from db_connections import get_connection_manager, per_database
+from db_worker import get_db_worker
+from metrics import registry as metrics
+
+# Outcome -> (what happened, for the prompt; placeholders a template may use, the first is required;
+#             lines used until Suzu has written some)
+OUTCOMES = {
+    "blackjack_single": (
+        "one player beat the dealer and takes the whole pot",
+        ("winner", "pot"),
+        ["🎉 {winner} cleans out the table and takes {pot} chips! Suzu is impressed... this time.",
+         "🏆 {winner} takes all {pot} chips! Suzu wants a rematch."],
+    ),
+    "blackjack_split": (
+        "several players beat the dealer and split the pot",
+        ("winners", "pot"),
+        ["🎉 {winners} beat the house together! Suzu is counting what's left of her chips.",
+         "🃏 {winners} split the winnings. Suzu will remember this."],
+    ),
+    "blackjack_dealer_bust": (
+        "the dealer went over 21 and busted, so everyone still standing wins",
+        ("winners", "pot"),
+        ["💥 The dealer busts! {winners} walk away happy. Suzu blames the cards.",
+         "💥 Dealer bust! {winners} got lucky, Suzu is NOT pouting."],
+    ),
+    "blackjack_house": (
+        "nobody beat the dealer, so the house keeps the pot",
+        ("pot",),
+        ["🃏 The house wins {pot} chips! Suzu thanks you all for your generous donations~",
+         "😼 Nobody beat the dealer. Suzu is keeping the {pot} chip pot."],
+    ),
+    "rpg_monster_appears": (
+        "a monster has appeared in chat and viewers can join the fight",
+        ("monster",),
+        [],
+    ),
+    "rpg_victory": (
+        "a player landed the final blow and the party defeated the monster",
+        ("player", "monster", "tokens"),
+        [],
+    ),
+    "rpg_defeat": (
+        "the monster defeated every player in the battle",
+        ("monster",),
+        [],
+    ),
+}
+
+NARRATION_LINES = metrics.counter("narration_lines_total", "Game announcements filled from templates, by outcome and source")
+NARRATION_GENERATED = metrics.counter("narration_templates_generated_total", "Templates written by Gemini, by outcome and result")
+
+
+class NarrationPool:
+    """Suzu-styled announcement templates per game outcome, written ahead of time by Gemini.
+
+    Templates live in the `narration_templates` table and in memory, and are
+    filled in locally when a round settles, so an announcement costs no LLM
+    call. A background task asks Gemini for a fresh batch whenever an
+    outcome's pool is short or has been up for `refresh_interval` seconds.
+    """
+
+    def __init__(self, db_path, pool_size=20, refresh_interval=6 * 3600, timeout=30, retry_delay=600):
+        self.db = get_connection_manager(db_path)
+        self.db_worker = get_db_worker(db_path)
+        self.pool_size = pool_size  # Templates Gemini writes per outcome and batch, the newest two batches are kept
+        self.refresh_interval = refresh_interval  # Seconds between fresh batches for an outcome
+        self.timeout = timeout  # Seconds to wait for Gemini to write a batch
+        self.retry_delay = retry_delay  # Seconds before trying again after Gemini failed
+        self.templates = {}  # Outcome -> templates, newest first
+        self.last_used = {}  # Outcome -> last template filled, so the same line doesn't come up twice in a row
+        self.next_refresh = {}  # Outcome -> loop time the next batch is due
+        self._task = None
+        self.setup_database()
+        self.load()
+
+    def setup_database(self):
+        conn = self.db.connection()
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS narration_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            outcome TEXT,
+            template TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_narration_outcome ON narration_templates(outcome, id)")
+        conn.commit()
+
+    def load(self):
+        """Read the stored templates into memory."""
+        templates = {}
+        rows = self.db.connection().execute("SELECT outcome, template FROM narration_templates ORDER BY id DESC")
+        for outcome, template in rows:
+            if outcome in OUTCOMES and self.validate(outcome, template):
+                templates.setdefault(outcome, []).append(template)
+        self.templates = templates
+
+    def render(self, outcome, **values):
+        """An announcement for the outcome with the values filled in, or None if there is nothing to say."""
+        templates = self.templates.get(outcome)
+        source = "pool"
+        if not templates:
+            templates = OUTCOMES[outcome][2]
+            source = "builtin"
+        if not templates:
+            return None
+
+        choices = [template for template in templates if template != self.last_used.get(outcome)] or templates
+        template = random.choice(choices)
+        self.last_used[outcome] = template
+        NARRATION_LINES.inc(outcome=outcome, source=source)
+        return template.format_map(values)
+
+    def validate(self, outcome, template):
+        """Whether a template is one chat line that only uses this outcome's placeholders, including the required one."""
+        _, placeholders, _ = OUTCOMES[outcome]
+        if not 10 <= len(template) <= 200 or "\n" in template:
+            return False
+        try:
+            fields = [(field, spec, conversion) for _, field, spec, conversion in string.Formatter().parse(template)
+                      if field is not None]
+        except ValueError:
+            return False  # Unbalanced braces
+        if any(field not in placeholders or spec or conversion for field, spec, conversion in fields):
+            return False
+        return not placeholders or placeholders[0] in {field for field, _, _ in fields}
+
+    def prompt(self, outcome):
+        description, placeholders, examples = OUTCOMES[outcome]
+        persona = os.getenv("SUZU_PROMPT_2") or ""
+        placeholder_text = ", ".join("{" + name + "}" for name in placeholders)
+        example_text = f" For example: {examples[0]}" if examples else ""
+        return (
+            f"{persona} Write {self.pool_size} different one-line Twitch chat announcements for this moment in a "
+            f"chat game: {description}. Use the placeholders {placeholder_text} exactly as written, including the "
+            f"curly braces, and always include {{{placeholders[0]}}}. Keep each under 200 characters.{example_text} "
+            f"Reply with one announcement per line and no other text."
+        )
+
+    async def refresh(self, model, outcome):
+        """Ask Gemini for a new batch of templates for an outcome. Returns how many were kept."""
+        response = await asyncio.wait_for(model.generate_content_async(self.prompt(outcome)), self.timeout)
+        lines = []
+        for line in response.text.splitlines():
+            line = line.strip().lstrip("-*•0123456789.) ").strip().strip('"')
+            if line and line not in lines:
+                if self.validate(outcome, line):
+                    lines.append(line)
+                else:
+                    NARRATION_GENERATED.inc(outcome=outcome, result="rejected")
+        if not lines:
+            return 0
+
+        await self.db_worker.call(self._store, outcome, lines)
+        self.templates[outcome] = (lines + self.templates.get(outcome, []))[:self.pool_size * 2]
+        NARRATION_GENERATED.inc(len(lines), outcome=outcome, result="kept")
+        return len(lines)
+
+    def _store(self, outcome, lines):
+        with self.db.transaction() as conn:
+            conn.executemany("INSERT INTO narration_templates (outcome, template) VALUES (?, ?)",
+                             [(outcome, line) for line in reversed(lines)])  # Newest id is the first line
+            conn.execute(
+                "DELETE FROM narration_templates WHERE outcome = ? AND id NOT IN "
+                "(SELECT id FROM narration_templates WHERE outcome = ? ORDER BY id DESC LIMIT ?)",
+                (outcome, outcome, self.pool_size * 2)
+            )
+
+    def due(self, outcome, now):
+        if outcome not in self.next_refresh:
+            # Stored pools that are already full wait a full interval after startup
+            if len(self.templates.get(outcome, [])) >= self.pool_size:
+                self.next_refresh[outcome] = now + self.refresh_interval
+                return False
+            return True
+        return now >= self.next_refresh[outcome]
+
+    async def _run(self, model):
+        loop = asyncio.get_running_loop()
+        while True:
+            for outcome in OUTCOMES:
+                if not self.due(outcome, loop.time()):
+                    continue
+                try:
+                    kept = await self.refresh(model, outcome)
+                    print(f"📝 Wrote {kept} new {outcome} announcements")
+                    self.next_refresh[outcome] = loop.time() + (self.refresh_interval if kept else self.retry_delay)
+                except asyncio.TimeoutError:
+                    print(f"⚠️ Gemini took over {self.timeout}s writing {outcome} announcements, will retry")
+                    self.next_refresh[outcome] = loop.time() + self.retry_delay
+                except Exception as e:
+                    print(f"⚠️ Error writing {outcome} announcements, will retry: {e}")
+                    self.next_refresh[outcome] = loop.time() + self.retry_delay
+            await asyncio.sleep(60)
+
+    def start(self, model):
+        """Keep the pools topped up in the background using `model`'s generate_content_async."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(model))
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+# Blackjack and the RPG draw from the same templates and refresh them once
+get_narration_pool = per_database(NarrationPool)
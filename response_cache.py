@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import re
+import time
+from collections import OrderedDict
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(text):
+    """Fold case, punctuation and whitespace so near-identical questions share a cache key."""
+    text = _PUNCTUATION.sub(" ", text.casefold())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def prompt_version(persona_prompt):
+    """Short fingerprint of the persona prompt, so a prompt change invalidates old answers."""
+    return hashlib.sha1((persona_prompt or "").encode("utf-8")).hexdigest()[:8]
+
+
+class ResponseCache:
+    """TTL + LRU cache for AI replies with single-flight de-duplication.
+
+    While a prompt is being fetched, identical prompts wait for that same
+    fetch instead of starting their own upstream call.
+    """
+
+    def __init__(self, max_entries=500, ttl=300, version=""):
+        self.max_entries = max_entries
+        self.ttl = ttl  # Seconds a cached reply stays fresh
+        self.version = version  # Persona prompt version, part of every key
+        self.entries = OrderedDict()  # Key -> (expires_at, response), least recently used first
+        self.in_flight = {}  # Key -> future shared by everyone waiting on the same prompt
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def key(self, prompt):
+        return (self.version, normalize_prompt(prompt))
+
+    def get(self, prompt):
+        """Return a fresh cached reply, or None."""
+        key = self.key(prompt)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at <= time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return response
+
+    def lookup(self, prompt):
+        """Like get(), but counts the lookup as a hit or miss."""
+        response = self.get(prompt)
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response
+
+    def set(self, prompt, response):
+        """Store a reply, evicting the least recently used entries past the size cap."""
+        key = self.key(prompt)
+        self.entries[key] = (time.monotonic() + self.ttl, response)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def get_or_fetch(self, prompt, fetch):
+        """Return a cached reply, join an identical in-flight fetch, or call `fetch()`.
+
+        `fetch` is a coroutine function returning (response, cacheable).
+        """
+        response = self.get(prompt)
+        if response is not None:
+            self.hits += 1
+            return response
+
+        key = self.key(prompt)
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        try:
+            response, cacheable = await fetch()
+        except asyncio.CancelledError:
+            future.set_exception(ConnectionError("AI request was cancelled"))
+            future.exception()  # Mark as retrieved in case nobody else was waiting
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(response)
+            if cacheable:
+                self.set(prompt, response)
+            return response
+        finally:
+            del self.in_flight[key]
+
+    def stats(self):
+        """Hit, miss and coalesce counts and rates."""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "coalesce_rate": self.coalesced / lookups if lookups else 0.0,
+            "miss_rate": self.misses / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,45 @@
+import bisect
+import hashlib
+
+
+def _hash(key):
+    """Stable 64-bit hash, the same in every process (unlike the built-in hash())."""
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hash ring mapping keys (channel names) onto nodes (connections or processes).
+
+    Adding or removing a node only moves the keys that node owned, so
+    resizing a deployment doesn't reshuffle every channel.
+    """
+
+    def __init__(self, nodes, replicas=100):
+        self.replicas = replicas  # Virtual points per node, smooths out the distribution
+        self.ring = []  # Sorted (point, node) pairs
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        for i in range(self.replicas):
+            bisect.insort(self.ring, (_hash(f"{node}#{i}"), node))
+
+    def remove(self, node):
+        self.ring = [(point, owner) for point, owner in self.ring if owner != node]
+
+    def node_for(self, key):
+        """The node that owns `key`."""
+        if not self.ring:
+            raise ValueError("HashRing has no nodes")
+        index = bisect.bisect(self.ring, (_hash(key),)) % len(self.ring)
+        return self.ring[index][1]
+
+
+def shard_channels(channels, shard_count, salt="shard"):
+    """Split channels into `shard_count` groups by consistent hashing. Returns a list of lists."""
+    names = {f"{salt}-{i}": i for i in range(shard_count)}
+    ring = HashRing(names)
+    shards = [[] for _ in range(shard_count)]
+    for channel in channels:
+        shards[names[ring.node_for(channel.lower())]].append(channel)
+    return shards
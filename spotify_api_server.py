@@ -5,6 +5,7 @@ import logging
 import urllib.parse
 from dotenv import load_dotenv
 from flask import render_template
+from metrics import instrument_flask
 
 load_dotenv()
 
@@ -16,6 +17,7 @@ if not SPOTIFY_REFRESH_TOKEN:
     raise ValueError("SPOTIFY_REFRESH_TOKEN is not set. Ensure it is securely stored.")
 
 app = Flask(__name__)
+instrument_flask(app, "spotify_api")  # Request latency histograms, served on /metrics and /metrics.json
 
 # Configure logging
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
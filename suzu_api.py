@@ -1,22 +1,23 @@
 import os
-import pyttsx3  # Offline TTS
-from gtts import gTTS  # Online TTS
-from flask import Flask, render_template, request, jsonify
+import json
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
-import google.generativeai as genai  # Gemini API
 import requests
-from suzu_twitch_api_server import get_bot_instance, set_bot_instance
-import ollama
+import threading
+from metrics import instrument_flask
+from lazy import Lazy, warmup
 
 # Load prompts from .env
 suzu_prompt = os.getenv("SUZU_PROMPT", "Default Suzu Prompt")
 suzu_prompt_2 = os.getenv("SUZU_PROMPT_2")
 
-bot_instance = get_bot_instance()  # Initialize bot instance from suzu_twitch_api_server
+bot_instance = None  # Set by main.py with set_bot_instance, or by /debug/init-dummy-bot
 
 # Global variable to track bot's active state
 is_bot_active = False
+bot_status_version = 0  # Bumped on every status change so the bot can long-poll for it
+bot_status_changed = threading.Condition()  # Wakes up long-polling watchers
 
 # Load API Keys from .env
 load_dotenv()
@@ -25,15 +26,25 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 # Flask App Setup
 app = Flask(__name__, template_folder="templates", static_folder="static")
 CORS(app)
+instrument_flask(app, "suzu_api")  # Request latency histograms, served on /metrics and /metrics.json
 
-# Configure Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-2.0-flash")
+def create_gemini_model():
+    import google.generativeai as genai  # Gemini API, slow to import so only loaded when first needed
 
-# Initialize TTS engine (Offline)
-engine = pyttsx3.init()
-engine.setProperty('rate', 150)  # Adjust speed
-engine.setProperty('volume', 1.0)  # Set volume
+    genai.configure(api_key=GEMINI_API_KEY)
+    return genai.GenerativeModel("gemini-2.0-flash")
+
+def create_tts_engine():
+    import pyttsx3  # Offline TTS
+
+    engine = pyttsx3.init()
+    engine.setProperty('rate', 150)  # Adjust speed
+    engine.setProperty('volume', 1.0)  # Set volume
+    return engine
+
+# Built on first use, or up front by warmup() when run as a server
+model = Lazy("suzu_api_gemini", create_gemini_model)
+engine = Lazy("suzu_api_tts", create_tts_engine)
 
 @app.route('/')
 def index():
@@ -68,29 +79,48 @@ def init_dummy_bot():
         return jsonify({"status": "Dummy bot initialized"})
     return jsonify({"status": "Bot already initialized"})
 
+def set_bot_active(active):
+    """Update the bot's active status and wake up anyone watching it."""
+    global is_bot_active, bot_status_version
+
+    with bot_status_changed:
+        if is_bot_active != active:
+            is_bot_active = active
+            bot_status_version += 1
+            bot_status_changed.notify_all()
+
 @app.route('/bot/status', methods=['GET'])
 def get_bot_status():
     """Get the bot's active status."""
-    global is_bot_active
     status = "active" if is_bot_active else "inactive"
-    return jsonify({"status": status})
+    return jsonify({"status": status, "version": bot_status_version})
+
+@app.route('/bot/status/watch', methods=['GET'])
+def watch_bot_status():
+    """Long-poll for the bot's status. Returns as soon as it differs from `version`, or after `timeout` seconds."""
+    version = request.args.get("version", type=int)
+    timeout = min(request.args.get("timeout", default=30, type=float), 60)
+
+    with bot_status_changed:
+        if version is not None:
+            bot_status_changed.wait_for(lambda: bot_status_version != version, timeout=timeout)
+        status = "active" if is_bot_active else "inactive"
+        return jsonify({"status": status, "version": bot_status_version})
 
 @app.route('/bot/control', methods=['POST'])
 def control_bot():
     """Control the bot's active status."""
-    global is_bot_active
-
     data = request.json
     if not data or "action" not in data:
         return jsonify({"error": "Missing 'action' in request"}), 400
 
     action = data["action"].lower()
     if action == "start":
-        is_bot_active = True
+        set_bot_active(True)
         print("Bot activated via API")  # Debug log
         return jsonify({"status": "Bot activated"})
     elif action == "stop":
-        is_bot_active = False
+        set_bot_active(False)
         print("Bot deactivated via API")  # Debug log
         return jsonify({"status": "Bot deactivated"})
     elif action == "status":
@@ -109,7 +139,6 @@ def generate_text():
 
     try:
         # Gemini API Call
-        model = genai.GenerativeModel("gemini-2.0-flash")
         # Ensure the combined input does not exceed 500 characters
         max_length = 500
         truncated_prompt = suzu_prompt_2[:max_length // 2]
@@ -133,7 +162,6 @@ def generate_twitchtext():
 
     try:
         # Gemini API Call
-        model = genai.GenerativeModel("gemini-2.0-flash")
         response = model.generate_content([suzu_prompt_2, user_input])
         ai_response = response.text.strip()
 
@@ -143,10 +171,71 @@ def generate_twitchtext():
         print(f"Error in twitchgenerate: {str(e)}")
         # Fallback response in case of API failure
         fallback_response = "I'm having trouble thinking right now. Please try again in a moment!"
-        return jsonify({"response": fallback_response})
+        return jsonify({"response": fallback_response, "fallback": True})
 
     # Search from Python
 
+@app.route('/twitchgenerate/stream', methods=['POST'])
+def generate_twitchtext_stream():
+    """Stream Suzu's reply as server-sent events while Gemini is still generating it."""
+    data = request.json or {}
+    user_input = data.get("text", "")
+
+    if not user_input:
+        return jsonify({"error": "No input provided"}), 400
+
+    def events():
+        sent_text = False
+        try:
+            # Gemini API Call
+            for chunk in model.generate_content([suzu_prompt_2, user_input], stream=True):
+                if chunk.text:
+                    sent_text = True
+                    yield f"data: {json.dumps({'text': chunk.text})}\n\n"
+            yield f"event: end\ndata: {json.dumps({'fallback': False})}\n\n"
+        except Exception as e:
+            print(f"Error in twitchgenerate stream: {str(e)}")
+            if not sent_text:
+                # Fallback response in case of API failure
+                fallback_response = "I'm having trouble thinking right now. Please try again in a moment!"
+                yield f"data: {json.dumps({'text': fallback_response})}\n\n"
+            yield f"event: end\ndata: {json.dumps({'fallback': True})}\n\n"
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.route('/twitchgenerate/batch', methods=['POST'])
+def generate_twitchtext_batch():
+    """Answer several chat messages with a single Gemini call."""
+    data = request.json or {}
+    texts = [text for text in data.get("texts", []) if isinstance(text, str) and text]
+
+    if not texts:
+        return jsonify({"error": "No input provided"}), 400
+
+    batch_prompt = (
+        f"Reply to each of the following {len(texts)} chat messages separately, as if each was the only message. "
+        "Respond with only a JSON array of strings containing one reply per message, in the same order."
+    )
+    messages = "\n".join(f"{i}. {text}" for i, text in enumerate(texts, 1))
+
+    try:
+        # Gemini API Call
+        response = model.generate_content(
+            [suzu_prompt_2, batch_prompt, messages],
+            generation_config={"response_mime_type": "application/json"}
+        )
+        replies = json.loads(response.text)
+        if not isinstance(replies, list) or len(replies) != len(texts):
+            raise ValueError(f"Expected {len(texts)} replies, got {replies!r}")
+
+        return jsonify({"responses": [str(reply).strip() for reply in replies]})
+
+    except Exception as e:
+        print(f"Error in twitchgenerate batch: {str(e)}")
+        # Fallback response in case of API failure
+        fallback_response = "I'm having trouble thinking right now. Please try again in a moment!"
+        return jsonify({"responses": [fallback_response] * len(texts), "fallback": True})
+
 @app.route('/localgenerate', methods=['POST'])
 def generate_localtext():
     data = request.json
@@ -165,6 +254,8 @@ def generate_localtext():
         return jsonify({"response": fallback_response})
 
 def get_gemma_response(prompt, model_name="gemma3:4b"): # Or "gemma3:1b"
+    import ollama  # Local models, only loaded when first needed
+
     try:
         # Ollama expects a 'messages' list for chat
         response = ollama.chat(
@@ -206,11 +297,12 @@ def speak():
         use_online_tts = True  # Set to True to use Google TTS instead of pyttsx3
 
         if use_online_tts:
+            from gtts import gTTS  # Online TTS
+
             tts = gTTS(text=text, lang="en")
             tts.save("static/suzu_tts.mp3")
             return jsonify({"status": "success", "audio_url": "/static/suzu_tts.mp3"})
         else:
-            engine = pyttsx3.init()
             engine.say(text)
             engine.runAndWait()
             return jsonify({"status": "success", "message": "Speaking..."})
@@ -223,4 +315,5 @@ def speak():
 
 
 if __name__ == '__main__':
+    warmup("suzu_api_gemini")  # Pay for Gemini before the first request instead of during it
     app.run(host= "0.0.0.0", port=8080, debug=True)
@@ -1,12 +1,10 @@
 import os
-import pyttsx3  # Offline TTS
-from gtts import gTTS  # Online TTS
 from flask import Flask, render_template, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
-import google.generativeai as genai  # Gemini API
 import requests
 import threading
+from lazy import Lazy, warmup
 
 suzu_prompt = """
 "You are a helpful and friendly AI assistant designed for a Twitch chat environment. Your name is Suzu. 
@@ -30,14 +28,23 @@ CORS(app)
 # Create a global variable to store the bot instance
 bot_instance = None
 
-# Configure Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-2.0-flash")
+def create_gemini_model():
+    import google.generativeai as genai  # Gemini API, slow to import so only loaded when first needed
 
-# Initialize TTS engine (Offline)
-engine = pyttsx3.init()
-engine.setProperty('rate', 150)  # Adjust speed
-engine.setProperty('volume', 1.0)  # Set volume
+    genai.configure(api_key=GEMINI_API_KEY)
+    return genai.GenerativeModel("gemini-2.0-flash")
+
+def create_tts_engine():
+    import pyttsx3  # Offline TTS
+
+    engine = pyttsx3.init()
+    engine.setProperty('rate', 150)  # Adjust speed
+    engine.setProperty('volume', 1.0)  # Set volume
+    return engine
+
+# Built on first use, or up front by warmup() when run as a server
+model = Lazy("suzu_chat_api_gemini", create_gemini_model)
+engine = Lazy("suzu_chat_api_tts", create_tts_engine)
 
 @app.route('/')
 def index():
@@ -89,7 +96,6 @@ def generate_twitchtext():
 
     try:
         # Gemini API Call
-        model = genai.GenerativeModel("gemini-2.0-flash")
         response = model.generate_content([suzu_prompt_2, user_input])
         ai_response = response.text.strip()
 
@@ -111,7 +117,6 @@ def generate_text():
 
     try:
         # Gemini API Call
-        model = genai.GenerativeModel("gemini-2.0-flash")
         response = model.generate_content([suzi_prompt, user_input])
         ai_response =  response.text.strip()
 
@@ -147,11 +152,12 @@ def speak():
         use_online_tts = True  # Set to True to use Google TTS instead of pyttsx3
 
         if use_online_tts:
+            from gtts import gTTS  # Online TTS
+
             tts = gTTS(text=text, lang="en")
             tts.save("static/suzu_tts.mp3")
             return jsonify({"status": "success", "audio_url": "/static/suzu_tts.mp3"})
         else:
-            engine = pyttsx3.init()
             engine.say(text)
             engine.runAndWait()
             return jsonify({"status": "success", "message": "Speaking..."})
@@ -164,4 +170,5 @@ def speak():
 
 
 if __name__ == '__main__':
+    warmup("suzu_chat_api_gemini")  # Pay for Gemini before the first request instead of during it
     app.run(host= "0.0.0.0", port=8080, debug=True)
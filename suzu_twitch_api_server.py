@@ -1,82 +1,238 @@
 import os
 import time
-import requests
 import asyncio
+import weakref
 import twitchio
-import sqlite3
 import aiohttp  # For asynchronous HTTP requests
-from twitch_rpg_game import RPGHandler
 from twitchio.ext import commands
 from dotenv import load_dotenv
-from collections import deque
 from datetime import datetime, timedelta
-from blackjack_game import BlackjackGame  # Import the blackjack game
+from ai_dispatcher import AIDispatcher
+from channel_state import ChannelState
+from chat_scheduler import SchedulerGroup, lane_for
+from chat_sender import ChatSender, StreamSplitter
+from cooldown_store import CooldownStore
+from ledger_archive import get_ledger_archiver
+from blackjack_game import BlackjackGame
+from response_cache import ResponseCache, prompt_version
+from sharding import shard_channels
+from metrics import registry as metrics, timed
+from lazy import Lazy
 
 # Load Twitch credentials from .env
 load_dotenv()
 TWITCH_TOKEN = os.getenv("TWITCH_TOKEN")
 TWITCH_CHANNEL = os.getenv("TWITCH_CHANNEL")
+# Comma separated list of channels to join, falls back to TWITCH_CHANNEL
+TWITCH_CHANNELS = [name.strip().lower() for name in os.getenv("TWITCH_CHANNELS", TWITCH_CHANNEL or "").split(",") if name.strip()]
+BOT_CONNECTIONS = int(os.getenv("BOT_CONNECTIONS", "1"))  # Twitch connections per process
+BOT_PROCESSES = int(os.getenv("BOT_PROCESSES", "1"))  # Worker processes, channels are spread across them
+TWITCH_ACCOUNT_TYPE = os.getenv("TWITCH_ACCOUNT_TYPE", "normal")  # normal, moderator or verified
 AI_API_URL = "http://localhost:8080/twitchgenerate"
 LEONS_AI_API_URL = "http://localhost:8080/generate"
+BOT_STATUS_WATCH_URL = "http://localhost:8080/bot/status/watch"
+BOT_STATUS_WATCH_TIMEOUT = 30  # Seconds the API may hold a status long-poll open
+BOT_METRICS_PORT = int(os.getenv("BOT_METRICS_PORT", "8081"))  # Serves /metrics and /metrics.json, 0 turns it off
+
+# Bot metrics, shared by every Bot in the process
+COMMAND_SECONDS = metrics.histogram("bot_command_seconds", "Twitch command latency by command")
+COMMAND_ERRORS = metrics.counter("bot_command_errors_total", "Twitch commands that failed, by command and error")
+CHAT_MESSAGES = metrics.counter("bot_chat_messages_total", "Chat messages seen by the bot")
+
+# Every Bot in this process, so the gauges below report all connections once
+_bots = weakref.WeakSet()
+
+def bot_samples(method):
+    """Gauge callback adding up a Bot samples method across every bot in the process, by label set."""
+    def collect():
+        totals = {}
+        for running_bot in list(_bots):
+            for labels, value in getattr(running_bot, method)():
+                key = tuple(sorted(labels.items()))
+                totals[key] = totals.get(key, 0) + value
+        return [(dict(key), value) for key, value in totals.items()]
+    return collect
+
+# Queue depths and cache counts are read when metrics are collected
+metrics.gauge("bot_ai_queue_depth", "AI questions waiting, by channel").add_callback(bot_samples("queue_depth_samples"))
+metrics.gauge("bot_ai_shed", "AI questions dropped, by channel and reason").add_callback(bot_samples("shed_samples"))
+metrics.gauge("bot_chat_send_pending", "Chat messages waiting for the rate limiter, by channel").add_callback(bot_samples("send_pending_samples"))
+metrics.gauge("bot_ai_cache", "AI reply cache lookups, by result").add_callback(bot_samples("cache_samples"))
 
 # Define Bot class
 class Bot(commands.Bot):
-    def __init__(self):
+    def __init__(self, channels=None):
+        self.channel_names = list(channels or TWITCH_CHANNELS)
         super().__init__(
             token=TWITCH_TOKEN,
             prefix="~",
-            initial_channels=[TWITCH_CHANNEL]
+            initial_channels=self.channel_names
         )
         self.is_active = False  # Default to inactive
+        self.status_task = None  # Long-poll task following the API's bot status
 
         # Initialize attributes
-        self.user_last_request = {}  # Track user requests for rate limiting
         self.cooldown_seconds = 10  # Each user must wait this many seconds between requests
-        self.message_queue = deque(maxlen=10)  # Queue system for processing messages
-        self.processing = False  # Track if the bot is processing messages
-        self.recent_messages = []  # Track conversation history
+        self.cooldown_window_limit = None  # Optionally allow at most this many requests...
+        self.cooldown_window_seconds = None  # ...per this many seconds
+        self.max_cooldown_entries = 20000  # Hard cap on tracked users per channel, least recently active are evicted first
         self.max_history = 5  # Maximum number of recent messages to store
+        self.metrics_port = BOT_METRICS_PORT  # Port for /metrics, shared by every bot in the process, 0 turns it off
+        self.refresh_narration = True  # Have Gemini keep Suzu's game announcement templates fresh in the background
+        self.ledger_flush_interval = None  # Seconds chip operations may wait to be committed as a group (e.g. 1.0 for busy raids), None commits each immediately
+        self.ledger_archiver = get_ledger_archiver(
+            "blackjack.db",
+            retain_days=90,  # Older ledger rows are moved to monthly rollups and gzip files
+            interval=3600  # Seconds between archive runs
+        )  # Shared by every bot in the process, set to None to keep every ledger row in the database
+        self.ai_scheduler = SchedulerGroup(
+            max_depth=50,  # Requests allowed to wait at once in each channel
+            max_per_user=2,  # Requests a single user may have waiting
+            max_age=90,  # Seconds before a waiting question is dropped as stale
+            on_shed=self.shed_request
+        )  # One AI queue per channel, served round-robin
+        self.ai_cache = ResponseCache(
+            max_entries=500,
+            ttl=300,  # Seconds a cached answer is reused
+            version=prompt_version(os.getenv("SUZU_PROMPT_2"))  # Persona changes invalidate old answers
+        )
+        self.ai_dispatcher = AIDispatcher(
+            AI_API_URL, self.ai_scheduler, self.ai_cache,
+            workers=3,
+            timeout=15,
+            batch_size=1,  # Set above 1 to answer bursts of questions with one batched prompt
+            batch_window=0.3  # Seconds to collect questions for a batch
+        )  # Pooled, non-blocking AI requests
+        self.shed_notice_delay = 3  # Seconds dropped AI requests are collected before one combined notice per reason
+        self.notice_max_pending = 1  # Skip notices like those while this many chat messages are waiting to be sent
+        self.stream_replies = False  # Send AI replies to chat while they are still being generated
+        self.chat_sender = ChatSender(TWITCH_ACCOUNT_TYPE, BOT_PROCESSES)  # Rate limited outbound messages, per channel and account-wide
+
+        # One blackjack game for every channel, each channel plays at its own table
+        self.blackjack = BlackjackGame(ledger_flush_interval=self.ledger_flush_interval)
+
+        # Per-channel AI queues, cooldowns, blackjack tables and RPG battles
+        self.channel_states = {}
+        for name in self.channel_names:
+            self.channel_state(name)
+        _bots.add(self)  # Report this bot's queues in the process-wide gauges
+
+    def channel_state(self, channel):
+        """Get the state for a channel (a twitchio channel or its name), creating it on first use."""
+        name = getattr(channel, "name", channel).lower()
+        state = self.channel_states.get(name)
+        if state is None:
+            user_cooldowns = CooldownStore(
+                cooldown_seconds=self.cooldown_seconds,
+                window_limit=self.cooldown_window_limit,
+                window_seconds=self.cooldown_window_seconds,
+                max_entries=self.max_cooldown_entries
+            )
+            state = ChannelState(name, self.ai_scheduler.scheduler(name), user_cooldowns, max_history=self.max_history,
+                                 blackjack=self.blackjack)
+            self.channel_states[name] = state
+        return state
+
+    def queue_depth_samples(self):
+        return [({"channel": name}, stats["depth"]) for name, stats in self.ai_scheduler.stats().items()]
+
+    def shed_samples(self):
+        return [
+            ({"channel": name, "reason": reason}, count)
+            for name, stats in self.ai_scheduler.stats().items()
+            for reason, count in stats["shed"].items()
+        ]
+
+    def send_pending_samples(self):
+        return [({"channel": name}, sender.pending) for name, sender in self.chat_sender.senders.items()]
+
+    def cache_samples(self):
+        stats = self.ai_cache.stats()
+        return [({"result": result}, stats[result]) for result in ("hits", "misses", "coalesced")]
+
+    async def watch_bot_status(self):
+        """Follow the API's bot status with long-polling, reconnecting with backoff on errors."""
+        version = None
+        backoff = 1
+        timeout = aiohttp.ClientTimeout(total=BOT_STATUS_WATCH_TIMEOUT + 10)
+
+        # One keep-alive session for the life of the bot
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            while True:
+                try:
+                    params = {"timeout": BOT_STATUS_WATCH_TIMEOUT}
+                    if version is not None:
+                        params["version"] = version
+                    async with session.get(BOT_STATUS_WATCH_URL, params=params) as response:
+                        response.raise_for_status()
+                        data = await response.json()
+
+                    version = data.get("version")
+                    new_status = data.get("status") == "active"
+                    if self.is_active != new_status:
+                        self.is_active = new_status
+                        print(f"Bot active status updated: {'active' if self.is_active else 'inactive'}")
+                    backoff = 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"Error watching bot status: {e}, retrying in {backoff}s")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 60)
 
-        # Initialize blackjack game
-        self.blackjack = BlackjackGame()
+    async def event_ready(self):
+        print(f"✅ Bot is ready and connected as {self.nick}")
+        # Start the AI workers
+        await self.ai_dispatcher.start(self.process_request)
+        # Start following the bot status pushed by the API
+        if self.status_task is None or self.status_task.done():
+            self.status_task = asyncio.create_task(self.watch_bot_status())
+        # Serve metrics for Prometheus and the control site
+        if self.metrics_port:
+            await metrics.start_server(self.metrics_port)
+        # Have Gemini top up the announcement templates in the background
+        if self.refresh_narration:
+            asyncio.create_task(self.start_narration())
+        # Keep the ledger small in the background
+        if self.ledger_archiver is not None:
+            self.ledger_archiver.start()
+
+    async def start_narration(self):
+        """Build the Gemini model off the event loop (its import takes over a second), then start the pool."""
+        try:
+            await asyncio.to_thread(self.blackjack.model.get)
+        except Exception as e:
+            print(f"⚠️ Could not load Gemini for announcements, using the stored ones: {e}")
+            return
+        self.blackjack.narration.start(self.blackjack.model)
 
-        # Initialize RPG handler
-        self.rpg_handler = RPGHandler("blackjack.db")
+    async def global_before_invoke(self, ctx):
+        ctx.metrics_started = time.perf_counter()
 
-    async def poll_bot_status(self):
-        """Periodically poll the API for the bot's active status."""
-        while True:
-            try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get("http://localhost:8080/bot/status") as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            new_status = data.get("status") == "active"
-                            if self.is_active != new_status:
-                                self.is_active = new_status
-                                print(f"Bot active status updated: {'active' if self.is_active else 'inactive'}")
-            except Exception as e:
-                print(f"Error polling bot status: {e}")
-            await asyncio.sleep(5)  # Poll every 5 seconds
+    async def global_after_invoke(self, ctx):
+        """Record how long the command took, runs after failed commands too."""
+        started = getattr(ctx, "metrics_started", None)
+        if started is not None:
+            COMMAND_SECONDS.observe(time.perf_counter() - started, command=ctx.command.name)
 
-    async def event_ready(self):
-        print(f"✅ Bot is ready and connected as {self.nick}")
-        # Start polling the bot status
-        asyncio.create_task(self.poll_bot_status())
+    async def event_command_error(self, ctx, error):
+        command = ctx.command.name if ctx.command else "unknown"
+        COMMAND_ERRORS.inc(command=command, error=type(error).__name__)
+        await super().event_command_error(ctx, error)
 
     # Raid event handler
     async def event_raid(self, event):
         print(f"🎉 Raid event received: {event}")
         # Send a message to the channel where the raid occurred
-        await event.channel.send(f"🎉 Thank you, {event.raider.name}, for the raid with {event.viewer_count} viewers! 🎉")
+        await self.say(event.channel, f"🎉 Thank you, {event.raider.name}, for the raid with {event.viewer_count} viewers! 🎉")
 
     # Simulates a raid
     @commands.command(name='testraid')
     async def test_raid(self, ctx):
         # Restrict access to the channel owner or a specific user
-        allowed_users = [TWITCH_CHANNEL.lower(), "thewittyleon"]
+        allowed_users = [ctx.channel.name.lower(), "thewittyleon"]
         if ctx.author.name.lower() not in allowed_users:
-            await ctx.send(f"Sorry {ctx.author.name}, you don't have permission to use this command.")
+            await self.say(ctx.channel, f"Sorry {ctx.author.name}, you don't have permission to use this command.")
             return
 
         # Fake data for simulation
@@ -91,6 +247,8 @@ class Bot(commands.Bot):
         await self.event_raid(fake_event)
 
     async def event_message(self, message):
+        CHAT_MESSAGES.inc()
+
         # Ignore messages if bot is not active
         if not self.is_active:
             # Still process admin commands to activate the bot
@@ -109,408 +267,461 @@ class Bot(commands.Bot):
 
         # Check if the message starts with 'hey Suzu'
         if message.content.lower().startswith("hey suzu"):
+            state = self.channel_state(message.channel)
             author = message.author.name.lower()
             user_message = message.content[len("hey suzu"):].strip()
 
             # If the user just said "hey suzu" with nothing else
             if not user_message:
-                await message.channel.send(f"Hi there {author}! How may I help?")
+                await self.say(message.channel, f"Hi there {author}! How may I help?")
                 return
 
             # Check if message exceeds character limit
             if len(user_message) > 400:
-                await message.channel.send(f"Sorry {author}, your message is too long! Please keep it under 400 characters.")
+                await self.say(message.channel, f"Sorry {author}, your message is too long! Please keep it under 400 characters.")
                 return
 
-            # Check rate limit for this user
-            current_time = datetime.now()
-            if author in self.user_last_request:
-                time_since_last = (current_time - self.user_last_request[author]).total_seconds()
-                if time_since_last < self.cooldown_seconds:
-                    remaining = int(self.cooldown_seconds - time_since_last)
-                    await message.channel.send(f"Please wait {remaining} seconds before asking again, {author}!")
-                    return
-
-            # Update last request time for this user
-            self.user_last_request[author] = current_time
-
-            # Add to queue and process
-            self.message_queue.append((message, user_message))
-            if not self.processing:
-                self.processing = True
-                await self.process_queue()
-
-    async def process_queue(self):
-        while self.message_queue:
-            message, user_message = self.message_queue.popleft()
-            author = message.author.name.lower()
-            
-            print(f"📩 Processing request from {author}: {user_message}")
-            
-            # Add to recent messages history
-            self.recent_messages.append(user_message)
-            if len(self.recent_messages) > self.max_history:
-                self.recent_messages.pop(0)
-            
-            # Send message to AI API
-            try:
-                # Send only the current message to the API, not the history
-                if author == "thewittyleon":
-                    response = requests.post(
-                        #LEONS_
-                        AI_API_URL,
-                        json={"text": user_message},
-                        timeout=15  # Add timeout to prevent hanging
-                    )
-                else:
-                    response = requests.post(
-                        AI_API_URL, 
-                        json={"text": user_message},
-                        timeout=15  # Add timeout to prevent hanging
-                    )
-                
-                # Check for HTTP errors
-                response.raise_for_status()
-                
-                response_data = response.json()
-                ai_response = response_data.get("response", "I'm not sure how to respond to that!")
-
-                # Check if the response exceeds the character limit
-                if len(ai_response) > 450:
-                    # Split the response into chunks of up to 450 characters without splitting words
-                    words = ai_response.split()
-                    chunks = []
-                    current_chunk = ""
-
-                    for word in words:
-                        if len(current_chunk) + len(word) + 1 > 450:  # +1 for the space
-                            chunks.append(current_chunk)
-                            current_chunk = word
-                        else:
-                            current_chunk += (" " if current_chunk else "") + word
-
-                    if current_chunk:
-                        chunks.append(current_chunk)
-
-                    # Send each chunk as a separate message
-                    for chunk in chunks:
-                        await message.channel.send(chunk)
-                        await asyncio.sleep(1)  # Add a small delay between messages
-                else:
-                    # Send Suzu's reply to the chat
-                    await message.channel.send(f"{ai_response}")
-
-                self.message_queue.clear()
-                
-                # Add a small delay between processing queue items to avoid rate limits
-                await asyncio.sleep(2)  # Increased delay to 2 seconds
-            
-            except requests.exceptions.HTTPError as e:
-                print(f"⚠️ HTTP Error communicating with Suzu API: {e}")
-                await message.channel.send("Suzu is having trouble processing your request right now!")
-            
-            except requests.exceptions.Timeout:
-                print(f"⚠️ Timeout error communicating with Suzu API")
-                await message.channel.send("Suzu is thinking too hard and needs a moment!")
-            
-            except Exception as e:
-                print(f"⚠️ Error communicating with Suzu API: {e}")
-                # Reset the queue if we encounter a serious error
-                if "Content must not exceed 500 characters" in str(e):
-                    print("Character limit exceeded. Clearing queue to prevent further issues.")
-                    self.message_queue.clear()
-                    await message.channel.send("Suzu's brain got overloaded! Please try a simpler question.")
-                else:
-                    await message.channel.send("Suzu is having trouble thinking right now!")
-        
-        self.processing = False
+            # Check rate limit for this user, recording the request if allowed
+            remaining = state.user_cooldowns.try_acquire(author)
+            if remaining:
+                # Only a reminder, so it never queues ahead of real replies
+                if self.can_notify(message.channel):
+                    await self.say(message.channel, f"Please wait {max(1, int(remaining))} seconds before asking again, {author}!")
+                return
+
+            # Add to the AI scheduler, broadcaster/mods/subs get priority lanes
+            await state.ai_scheduler.put(author, (message, user_message), lane_for(message.author))
+
+    async def shed_request(self, request, reason):
+        """Queue a notice that a user's AI request was dropped, sent combined with any others shortly after."""
+        message = request.payload[0]
+        state = self.channel_state(message.channel)
+        state.shed_notices.append((reason, request))
+        if state.shed_notice_task is None or state.shed_notice_task.done():
+            state.shed_notice_task = asyncio.create_task(self.send_shed_notices(message.channel, state))
+
+    async def send_shed_notices(self, channel, state):
+        # Collect for a moment so a raid's worth of drops becomes a line or two
+        await asyncio.sleep(self.shed_notice_delay)
+        notices, state.shed_notices = state.shed_notices, []
+        await self.say_shed_notices(channel, notices)
+
+    async def say_shed_notices(self, channel, notices):
+        """Tell users their AI requests were dropped, in at most two lines naming everyone affected.
+
+        Skipped unless there is spare chat capacity, so they never hold up real replies.
+        """
+        if not self.can_notify(channel):
+            return
+
+        waiting, dropped = [], []  # Users who already have a question queued, users whose question was dropped
+        for reason, request in notices:
+            names = waiting if reason == "user_limit" else dropped  # queue_full, displaced or expired
+            author = request.payload[0].author.name.lower()
+            if author not in names:
+                names.append(author)
+
+        if waiting:
+            await self.say(channel, f"{self.list_names(waiting)}: you already have a question waiting! Suzu will get to it soon.")
+        if dropped:
+            await self.say(channel, f"Sorry {self.list_names(dropped)}, Suzu is answering a lot of questions right now "
+                                    f"and couldn't get to yours. Please ask again in a bit!")
+
+    def can_notify(self, channel):
+        """Whether there is room for a notice: nothing waiting in this channel and a token left on the account."""
+        sender = self.chat_sender.senders.get(channel.name)
+        if sender is not None and sender.pending >= self.notice_max_pending:
+            return False
+        return self.chat_sender.account_bucket.delay() <= 0
+
+    def list_names(self, names, limit=8):
+        return ", ".join(names[:limit]) + (f" and {len(names) - limit} more" if len(names) > limit else "")
+
+    @timed("bot_ai_reply_seconds", "Time to answer a queued AI question")
+    async def process_request(self, message, user_message):
+        """Answer a single queued AI request. Called by the AI dispatcher workers."""
+        author = message.author.name.lower()
+
+        print(f"📩 Processing request from {author}: {user_message}")
+
+        # Add to recent messages history, the deque drops the oldest entry itself
+        self.channel_state(message.channel).recent_messages.append(user_message)
+
+        # Send message to AI API
+        try:
+            # Send only the current message to the API, not the history
+            if self.stream_replies:
+                await self.stream_reply(message.channel, user_message)
+            else:
+                ai_response = await self.ai_dispatcher.generate(user_message)
+
+                # Send Suzu's reply to the chat, split into 450 character chunks if needed
+                await self.say(message.channel, ai_response)
+
+        except aiohttp.ClientResponseError as e:
+            print(f"⚠️ HTTP Error communicating with Suzu API: {e}")
+            await self.say(message.channel, "Suzu is having trouble processing your request right now!")
+
+        except asyncio.TimeoutError:
+            print(f"⚠️ Timeout error communicating with Suzu API")
+            await self.say(message.channel, "Suzu is thinking too hard and needs a moment!")
+
+        except Exception as e:
+            print(f"⚠️ Error communicating with Suzu API: {e}")
+            if "Content must not exceed 500 characters" in str(e):
+                print("Character limit exceeded.")
+                await self.say(message.channel, "Suzu's brain got overloaded! Please try a simpler question.")
+            else:
+                await self.say(message.channel, "Suzu is having trouble thinking right now!")
+
+    async def stream_reply(self, channel, user_message):
+        """Stream Suzu's reply into chat, sending each 450 character chunk as soon as it is complete."""
+        splitter = StreamSplitter(450)
+        sent = False
+
+        async for text in self.ai_dispatcher.stream(user_message):
+            for chunk in splitter.feed(text):
+                await self.say(channel, chunk)
+                sent = True
+
+        for chunk in splitter.flush():
+            await self.say(channel, chunk)
+            sent = True
+
+        if not sent:
+            await self.say(channel, "I'm not sure how to respond to that!")
+
+    async def say(self, channel, text):
+        """Send a message through the channel's rate limited sender."""
+        await self.chat_sender.send(channel, text)
+
+    async def close(self):
+        """Stop the background tasks before disconnecting."""
+        if self.status_task is not None:
+            self.status_task.cancel()
+        for state in self.channel_states.values():
+            if state.shed_notice_task is not None:
+                state.shed_notice_task.cancel()
+        await self.ai_dispatcher.stop()
+        self.blackjack.narration.stop()
+        if self.ledger_archiver is not None:
+            await asyncio.to_thread(self.ledger_archiver.stop)
+        # Commit the waiting ledger group, then close the SQLite connections so the WAL is checkpointed
+        await self.blackjack.db_worker.call(self.blackjack.close)
+        await self.blackjack.db_worker.call(self.blackjack.db.close_all)
+        await super().close()
 
     # RPG commands
     @commands.command(name="rpgstats")
     async def rpg_stats_command(self, ctx, target_user=None):
         """Check your or another user's RPG stats"""
+        rpg = self.channel_state(ctx.channel).rpg_handler
         if target_user:
             username = target_user.lower()
         else:
             username = ctx.author.name
         
-        response = self.rpg_handler.get_user_stats(username)
-        await ctx.send(response)
+        response = await rpg.db_worker.call(rpg.get_user_stats, username)
+        await self.say(ctx.channel, response)
 
     @commands.command(name="gainxp")
     async def gain_xp_command(self, ctx, amount: int = 0):
         """Gain XP for the current user"""
+        rpg = self.channel_state(ctx.channel).rpg_handler
         username = ctx.author.name
-        response = self.rpg_handler.gain_xp(username, amount)
-        await ctx.send(response)
+        response = await rpg.db_worker.call(rpg.gain_xp, username, amount)
+        await self.say(ctx.channel, response)
 
     @commands.command(name="buy")
     async def buy_command(self, ctx, item_name: str):
         """Buy an item"""
+        rpg = self.channel_state(ctx.channel).rpg_handler
         username = ctx.author.name
-        response = self.rpg_handler.buy_item(username, item_name)
-        await ctx.send(response)
+        response = await rpg.db_worker.call(rpg.buy_item, username, item_name)
+        await self.say(ctx.channel, response)
 
     @commands.command(name="use")
     async def use_command(self, ctx, item_name: str):
         """Use an item"""
+        rpg = self.channel_state(ctx.channel).rpg_handler
         username = ctx.author.name
-        response = self.rpg_handler.use_item(username, item_name)
-        await ctx.send(response)
+        response = await rpg.db_worker.call(rpg.use_item, username, item_name)
+        await self.say(ctx.channel, response)
 
     @commands.command(name="roll")
     async def roll_command(self, ctx, dice_notation="1d6"):
         """Rolls dice in the format 'NdM' (e.g., 2d6, 1d20)."""
+        rpg = self.channel_state(ctx.channel).rpg_handler
         author = ctx.author.name
-        result = self.rpg_handler.roll_dice(dice_notation)
+        result = rpg.roll_dice(dice_notation)
 
         if result is None:
-            await ctx.send(f"@{author}, Invalid dice notation. Use 'NdM' (e.g., 2d6, 1d20).")
+            await self.say(ctx.channel, f"@{author}, Invalid dice notation. Use 'NdM' (e.g., 2d6, 1d20).")
         else:
-            await ctx.send(f"@{author}, rolled {dice_notation}: {result}")
+            await self.say(ctx.channel, f"@{author}, rolled {dice_notation}: {result}")
 
     @commands.command(name="xp")
     async def xp_command(self, ctx, target_user=None):
         """Check your or another user's XP"""
+        rpg = self.channel_state(ctx.channel).rpg_handler
         if target_user:
             username = target_user.lower()
         else:
             username = ctx.author.name
         
-        response = self.rpg_handler.get_user_xp(username)
-        await ctx.send(response)
+        response = await rpg.db_worker.call(rpg.get_user_xp, username)
+        await self.say(ctx.channel, response)
 
     @commands.command(name="spawnmonster")
     async def spawn_monster_command(self, ctx, challenge_rating: float = None):
         """Spawn a monster for battle."""
-        monster = self.rpg_handler.spawn_monster(challenge_rating)
+        rpg = self.channel_state(ctx.channel).rpg_handler
+        monster = await rpg.db_worker.call(rpg.spawn_monster, challenge_rating)
         if not monster:
-            await ctx.send("Failed to spawn a monster!")
+            await self.say(ctx.channel, "Failed to spawn a monster!")
             return
 
-        response = self.rpg_handler.start_battle(ctx.channel.name, monster)
-        await ctx.send(response)
+        response = await rpg.db_worker.call(rpg.start_battle, ctx.channel.name, monster)
+        await self.say(ctx.channel, response)
 
     @commands.command(name="joinbattle")
     async def join_battle_command(self, ctx):
         """Join the current battle."""
+        rpg = self.channel_state(ctx.channel).rpg_handler
         username = ctx.author.name
-        response = self.rpg_handler.join_battle(username)
-        await ctx.send(response)
+        response = await rpg.db_worker.call(rpg.join_battle, username)
+        await self.say(ctx.channel, response)
 
     @commands.command(name="attack")
     async def attack_command(self, ctx):
         """Attack the monster."""
+        rpg = self.channel_state(ctx.channel).rpg_handler
         username = ctx.author.name
 
         # Check if it's the player's turn
-        current_turn = self.rpg_handler.get_next_initiative()
+        current_turn = await rpg.db_worker.call(rpg.get_next_initiative)
         print(current_turn)
         if current_turn[1] != username:
-            await ctx.send(f"@{username}, it's not your turn to attack!")
+            await self.say(ctx.channel, f"@{username}, it's not your turn to attack!")
             return
 
-        response = self.rpg_handler.player_attack(username)
-        await ctx.send(response)
-        response = self.rpg_handler.take_turn()
+        response = await rpg.db_worker.call(rpg.player_attack, username)
+        await self.say(ctx.channel, response)
+        response = await rpg.db_worker.call(rpg.take_turn)
         while True:
             if "to attack the monster" in response or "No battle is currently active" in response:
                 break
             else:
-                await asyncio.sleep(1)
-                await ctx.send(response)
-                response = self.rpg_handler.take_turn()
-        next_initiative = self.rpg_handler.get_next_initiative()
+                await self.say(ctx.channel, response)
+                response = await rpg.db_worker.call(rpg.take_turn)
+        next_initiative = await rpg.db_worker.call(rpg.get_next_initiative)
         print(next_initiative)
         if next_initiative[0] == "monster":
-            response = self.rpg_handler.monster_attack()
-            await asyncio.sleep(1)
-            await ctx.send(response)
-            next_initiative = self.rpg_handler.get_next_initiative()
-            await asyncio.sleep(1)
-            await ctx.send(f"It is now {next_initiative[1]}'s turn to attack the monster!")
+            response = await rpg.db_worker.call(rpg.monster_attack)
+            await self.say(ctx.channel, response)
+            next_initiative = await rpg.db_worker.call(rpg.get_next_initiative)
+            await self.say(ctx.channel, f"It is now {next_initiative[1]}'s turn to attack the monster!")
         else:
-            next_initiative = self.rpg_handler.get_next_initiative()
-            await asyncio.sleep(1)
-            await ctx.send(f"It is now {next_initiative[1]}'s turn to attack the monster!")
+            next_initiative = await rpg.db_worker.call(rpg.get_next_initiative)
+            await self.say(ctx.channel, f"It is now {next_initiative[1]}'s turn to attack the monster!")
 
     @commands.command(name="adminheal")
     async def admin_heal_command(self, ctx):
         """Heal all players in the current battle."""
+        rpg = self.channel_state(ctx.channel).rpg_handler
         # Check if the command user is an admin
         admin_users = ["thewittyleon"]  # Replace with actual admin usernames
         if ctx.author.name.lower() not in [admin.lower() for admin in admin_users]:
-            await ctx.send(f"@{ctx.author.name}, you don't have permission to use this command.")
+            await self.say(ctx.channel, f"@{ctx.author.name}, you don't have permission to use this command.")
             return
 
         # Check if a battle is active
-        if not self.rpg_handler.active_battle:
-            await ctx.send("No battle is currently active!")
+        if not rpg.active_battle:
+            await self.say(ctx.channel, "No battle is currently active!")
             return
 
         # Heal all players in the current battle
-        players = self.rpg_handler.active_battle["players"]
+        players = rpg.active_battle["players"]
         if not players:
-            await ctx.send("No players are in the battle to heal!")
+            await self.say(ctx.channel, "No players are in the battle to heal!")
             return
 
         responses = []
         for player in players:
-            response = self.rpg_handler.heal_player(player)
+            response = await rpg.db_worker.call(rpg.heal_player, player)
             responses.append(response)
 
         # Send the healing results
-        await ctx.send("\n".join(responses))
+        await self.say(ctx.channel, "\n".join(responses))
 
     @commands.command(name="monsterattack")
     async def monster_attack_command(self, ctx):
         """Make the monster attack a random player."""
-        response = self.rpg_handler.monster_attack()
-        await ctx.send(response)
-        response = self.rpg_handler.take_turn()
+        rpg = self.channel_state(ctx.channel).rpg_handler
+        response = await rpg.db_worker.call(rpg.monster_attack)
+        await self.say(ctx.channel, response)
+        response = await rpg.db_worker.call(rpg.take_turn)
         while True:
             if "to attack the monster" in response or "No battle is currently active" in response:
                 break
             else:
-                await asyncio.sleep(1)
-                await ctx.send(response)
-                response = self.rpg_handler.take_turn()
-        next_initiative = self.rpg_handler.get_next_initiative()
+                await self.say(ctx.channel, response)
+                response = await rpg.db_worker.call(rpg.take_turn)
+        next_initiative = await rpg.db_worker.call(rpg.get_next_initiative)
         print(next_initiative)
         if next_initiative[0] == "monster":
-            response = self.rpg_handler.monster_attack()
-            await ctx.send(response)
+            response = await rpg.db_worker.call(rpg.monster_attack)
+            await self.say(ctx.channel, response)
         else:
-            response = self.rpg_handler.get_next_initiative()
-            await ctx.send(f"It is now {next_initiative[1]}'s turn to attack the monster!")
+            response = await rpg.db_worker.call(rpg.get_next_initiative)
+            await self.say(ctx.channel, f"It is now {next_initiative[1]}'s turn to attack the monster!")
 
     @commands.command(name="startbattle")
     async def start_battle_command(self, ctx):
         """Start the battle after players have joined."""
-        response = self.rpg_handler.start_battle_trigger()
-        await ctx.send(response)
+        rpg = self.channel_state(ctx.channel).rpg_handler
+        response = await rpg.db_worker.call(rpg.start_battle_trigger)
+        await self.say(ctx.channel, response)
 
     # Blackjack commands
     @commands.command(name="blackjack")
     async def blackjack_command(self, ctx):
         """Start a new blackjack game"""
+        game = self.channel_state(ctx.channel).blackjack
         channel = ctx.channel.name
-        response = self.blackjack.start_game(channel)
-        await ctx.send(response)
+        response = await game.db_worker.call(game.start_game, channel)
+        await self.say(ctx.channel, response)
 
     @commands.command(name="bet")
     async def bet_command(self, ctx, amount: int = 10):
         """Join the blackjack game with a bet"""
+        game = self.channel_state(ctx.channel).blackjack
         channel = ctx.channel.name
         username = ctx.author.name
-        response = self.blackjack.join_game(channel, username, amount)
-        await ctx.send(response)
+        response = await game.db_worker.call(game.join_game, channel, username, amount)
+        await self.say(ctx.channel, response)
 
     @commands.command(name="deal")
     async def deal_command(self, ctx):
         """Start dealing cards after betting is complete"""
+        game = self.channel_state(ctx.channel).blackjack
         channel = ctx.channel.name
-        response = self.blackjack.start_dealing(channel)
-        await ctx.send(response)
+        response = await game.db_worker.call(game.start_dealing, channel)
+        await self.say(ctx.channel, response)
 
     @commands.command(name="hit")
     async def hit_command(self, ctx):
         """Request another card"""
+        game = self.channel_state(ctx.channel).blackjack
         channel = ctx.channel.name
         username = ctx.author.name
-        response = self.blackjack.hit(channel, username)
-        await ctx.send(response)
+        response = await game.db_worker.call(game.hit, channel, username)
+        await self.say(ctx.channel, response)
 
     @commands.command(name="stand")
     async def stand_command(self, ctx):
         """Stand with your current hand"""
+        game = self.channel_state(ctx.channel).blackjack
         channel = ctx.channel.name
         username = ctx.author.name
-        response = self.blackjack.stand(channel, username)
-        await ctx.send(response)
+        response = await game.db_worker.call(game.stand, channel, username)
+        await self.say(ctx.channel, response)
 
     @commands.command(name="dealer")
     async def dealer_command(self, ctx):
         """Dealer plays their hand and determine winners"""
+        game = self.channel_state(ctx.channel).blackjack
         channel = ctx.channel.name
-        response = self.blackjack.dealer_play(channel)
-        # Split long responses into multiple messages if needed
-        if len(response) > 450:
-            chunks = [response[i:i+450] for i in range(0, len(response), 450)]
-            for chunk in chunks:
-                await ctx.send(chunk)
-        else:
-            await ctx.send(response)
+        response = await game.db_worker.call(game.dealer_play, channel)
+        # Long responses are split into multiple messages by the sender
+        await self.say(ctx.channel, response)
+        # Suzu's take on the round, filled in from pre-written templates without calling Gemini.
+        # It reads the table and the shared template pool, so it runs on the DB thread like every game call
+        announcement = await game.db_worker.call(game.winning_response, channel)
+        if announcement:
+            await self.say(ctx.channel, announcement)
 
     @commands.command(name="balance")
     async def balance_command(self, ctx):
         """Check your chip balance"""
+        game = self.channel_state(ctx.channel).blackjack
         username = ctx.author.name
-        response = self.blackjack.get_balance(username)
-        await ctx.send(response)
+        response = await game.db_worker.call(game.get_balance, username)
+        await self.say(ctx.channel, response)
 
     @commands.command(name="stats")
     async def stats_command(self, ctx, target_user=None):
         """Check your or another user's blackjack stats"""
+        game = self.channel_state(ctx.channel).blackjack
         if target_user:
             username = target_user.lower()
         else:
             username = ctx.author.name
         
-        response = self.blackjack.get_stats(username)
-        await ctx.send(response)
+        response = await game.db_worker.call(game.get_stats, username)
+        await self.say(ctx.channel, response)
 
     @commands.command(name="leaderboard")
-    async def leaderboard_command(self, ctx):
-        """Show the blackjack leaderboard"""
-        leaderboard = self.blackjack.get_leaderboard(5)
+    async def leaderboard_command(self, ctx, page: int = 1):
+        """Show the blackjack leaderboard, 5 players per page"""
+        game = self.channel_state(ctx.channel).blackjack
+        page = max(page, 1)
+        offset = (page - 1) * 5
+        leaderboard = await game.db_worker.call(game.get_leaderboard, 5, offset)
         
         if not leaderboard:
-            await ctx.send("No players have played blackjack yet!")
+            if page == 1:
+                await self.say(ctx.channel, "No players have played blackjack yet!")
+            else:
+                await self.say(ctx.channel, f"There's no leaderboard page {page}!")
             return
         
-        response = ["🏆 Blackjack Leaderboard 🏆"]
-        for i, (username, chips, wins, losses) in enumerate(leaderboard, 1):
+        response = ["🏆 Blackjack Leaderboard 🏆" if page == 1 else f"🏆 Blackjack Leaderboard (page {page}) 🏆"]
+        for i, (username, chips, wins, losses) in enumerate(leaderboard, offset + 1):
             response.append(f"{i}. {username}: {chips} chips | W: {wins} L: {losses}")
         
-        await ctx.send("\n".join(response))
+        await self.say(ctx.channel, "\n".join(response))
+
+    @commands.command(name="rank")
+    async def rank_command(self, ctx, target_user=None):
+        """Show where you or another user stand on the leaderboard"""
+        game = self.channel_state(ctx.channel).blackjack
+        username = target_user.lower() if target_user else ctx.author.name
+        rank = await game.db_worker.call(game.get_rank, username)
+
+        if rank is None:
+            await self.say(ctx.channel, f"{username} isn't on the leaderboard yet!")
+            return
+
+        position, total, chips = rank
+        await self.say(ctx.channel, f"🏆 {username} is #{position} of {total} with {chips} chips")
 
     @commands.command(name="addchips")
     async def addchips_command(self, ctx, target_user=None, amount: int = 100):
         """Admin command to add chips to a user"""
+        game = self.channel_state(ctx.channel).blackjack
         # Check if the command user is an admin (you can customize this check)
         if ctx.author.name.lower() not in ["thewittyleon"]:
-            await ctx.send("You don't have permission to use this command!")
+            await self.say(ctx.channel, "You don't have permission to use this command!")
             return
         
         if not target_user:
-            await ctx.send("Please specify a user to add chips to!")
+            await self.say(ctx.channel, "Please specify a user to add chips to!")
             return
         
-        response = self.blackjack.add_chips(target_user.lower(), amount)
-        await ctx.send(response)
+        response = await game.db_worker.call(game.add_chips, target_user.lower(), amount)
+        await self.say(ctx.channel, response)
 
     @commands.command(name="daily")
     async def daily_command(self, ctx):
         """Claim daily chips (once per 24 hours)"""
+        game = self.channel_state(ctx.channel).blackjack
         username = ctx.author.name
         
         # Check if user has claimed within 24 hours
-        conn = sqlite3.connect(self.blackjack.db_path)
-        cursor = conn.cursor()
+        last_claim_time = await game.db_worker.call(game.get_last_daily_claim, username)
         
-        cursor.execute(
-            "SELECT timestamp FROM transactions WHERE username = ? AND type = 'daily' ORDER BY timestamp DESC LIMIT 1",
-            (username,)
-        )
-        
-        last_claim = cursor.fetchone()
-        conn.close()
-        
-        if last_claim:
-            # Convert timestamp string to datetime
-            from datetime import datetime
-            last_claim_time = datetime.strptime(last_claim[0], "%Y-%m-%d %H:%M:%S")
+        if last_claim_time:
             current_time = datetime.now()
             
             # Check if 24 hours have passed
@@ -520,37 +731,50 @@ class Bot(commands.Bot):
                 print (hours_left)
                 print (time_diff.total_seconds())
                 print (time_diff.total_seconds() / 3600)
-                await ctx.send(f"{username}, you can claim your daily chips in {int(hours_left)} hours and {int((hours_left % 1) * 60)} minutes.")
+                await self.say(ctx.channel, f"{username}, you can claim your daily chips in {int(hours_left)} hours and {int((hours_left % 1) * 60)} minutes.")
                 return
         
         # Give daily chips
         daily_amount = 100
-        new_balance = self.blackjack.update_user_chips(username, daily_amount, "daily")
-        await ctx.send(f"💰 {username} claimed {daily_amount} daily chips! New balance: {new_balance} chips")
+        new_balance = await game.db_worker.call(game.update_user_chips, username, daily_amount, "daily")
+        await self.say(ctx.channel, f"💰 {username} claimed {daily_amount} daily chips! New balance: {new_balance} chips")
 
     @commands.command(name="give")
     async def give_command(self, ctx, target_user=None, amount: int = 0):
         """Give chips to another user"""
+        game = self.channel_state(ctx.channel).blackjack
         if not target_user or amount <= 0:
-            await ctx.send("Usage: ~give [username] [amount]")
+            await self.say(ctx.channel, "Usage: ~give [username] [amount]")
             return
         
         sender = ctx.author.name
         recipient = target_user.lower()
         
-        # Check if sender has enough chips
-        sender_chips = self.blackjack.get_user_chips(sender)
-        if sender_chips < amount:
-            await ctx.send(f"Sorry {sender}, you only have {sender_chips} chips.")
+        # Debit, credit and both ledger rows in one transaction, refused if the sender can't cover it
+        sent, balance = await game.db_worker.call(game.transfer_chips, sender, recipient, amount)
+        if not sent:
+            await self.say(ctx.channel, f"Sorry {sender}, you only have {balance} chips.")
             return
         
-        # Deduct from sender
-        self.blackjack.update_user_chips(sender, -amount, "give_sent")
-        
-        # Add to recipient
-        recipient_balance = self.blackjack.update_user_chips(recipient, amount, "give_received")
-        
-        await ctx.send(f"💸 {sender} gave {amount} chips to {recipient}! {recipient}'s new balance: {recipient_balance} chips")
+        await self.say(ctx.channel, f"💸 {sender} gave {amount} chips to {recipient}! {recipient}'s new balance: {balance} chips")
+
+    @commands.command(name="queuestats")
+    async def queue_stats_command(self, ctx):
+        """Show AI queue depth, wait times and shed counts"""
+        admin_users = ["thewittyleon"]  # Replace with actual admin usernames
+        if ctx.author.name.lower() not in admin_users and not ctx.author.is_mod:
+            await self.say(ctx.channel, f"@{ctx.author.name}, you don't have permission to use this command.")
+            return
+
+        stats = self.channel_state(ctx.channel).ai_scheduler.stats()
+        lanes = ", ".join(f"{lane}: {depth}" for lane, depth in stats["depth_by_lane"].items())
+        shed = ", ".join(f"{reason}: {count}" for reason, count in stats["shed"].items())
+        cache = self.ai_cache.stats()
+        await self.say(ctx.channel, 
+            f"📊 AI queue: {stats['depth']} waiting ({lanes}) | Served: {stats['served']} | "
+            f"Avg wait: {stats['avg_wait']:.1f}s | Max wait: {stats['max_wait']:.1f}s | Shed: {shed} | "
+            f"Cache: {cache['hit_rate']:.0%} hits, {cache['coalesce_rate']:.0%} coalesced, {cache['misses']} misses"
+        )
 
     @commands.command(name="admin")
     async def admin_command(self, ctx, action=None):
@@ -559,20 +783,20 @@ class Bot(commands.Bot):
         admin_users = ["thewittyleon"]  # Replace with actual admin usernames
         
         if ctx.author.name.lower() not in [admin.lower() for admin in admin_users]:
-            await ctx.send(f"@{ctx.author.name}, you don't have permission to use admin commands.")
+            await self.say(ctx.channel, f"@{ctx.author.name}, you don't have permission to use admin commands.")
             return
             
         if action == "start":
             self.is_active = True
-            await ctx.send("Bot is now active and responding to commands.")
+            await self.say(ctx.channel, "Bot is now active and responding to commands.")
         elif action == "stop":
             self.is_active = False
-            await ctx.send("Bot is now inactive and will only respond to admin commands.")
+            await self.say(ctx.channel, "Bot is now inactive and will only respond to admin commands.")
         elif action == "status":
             status = "active" if self.is_active else "inactive"
-            await ctx.send(f"Bot is currently {status}.")
+            await self.say(ctx.channel, f"Bot is currently {status}.")
         else:
-            await ctx.send(f"@{ctx.author.name}, valid admin commands: start, stop, status")
+            await self.say(ctx.channel, f"@{ctx.author.name}, valid admin commands: start, stop, status")
 
 
     @commands.command(name="help")
@@ -595,29 +819,64 @@ class Bot(commands.Bot):
                 "💰 Economy Commands 💰",
                 "~balance - Check your chip balance",
                 "~stats - View your game statistics",
-                "~leaderboard - See top players",
+                "~leaderboard [page] - See top players",
+                "~rank [user] - See where you stand",
                 "~daily - Claim daily chips",
                 "~give [user] [amount] - Give chips to another user"
             ]
         }
 
         if page < 1 or page > len(help_pages):
-            await ctx.send(f"📖 Available help pages: 1-{len(help_pages)}")
+            await self.say(ctx.channel, f"📖 Available help pages: 1-{len(help_pages)}")
             return
 
-        await ctx.send(f"Page {page}/{len(help_pages)}\n" + "\n".join(help_pages[page]))
+        await self.say(ctx.channel, f"Page {page}/{len(help_pages)}\n" + "\n".join(help_pages[page]))
 
-# Expose the bot instance for external use
-bot = Bot()
+# Expose the bot instance for external use, built on first use so importing this module stays cheap
+bot = Lazy("twitch_bot", Bot)
 
 def get_bot_instance():
-    return bot
+    return bot.get()
 
 def set_bot_instance(instance):
-    global bot  # Declare bot as global to modify it
-    bot = instance
-    print(f"Bot instance set: {bot}")  # Debug log
+    bot.set(instance)
+    print(f"Bot instance set: {instance}")  # Debug log
+
+def run_connections(channels, connections, metrics_port=BOT_METRICS_PORT):
+    """Run one bot per Twitch connection on a single event loop, channels spread by consistent hashing."""
+    loop = asyncio.get_event_loop()
+    bots = [Bot(group) for group in shard_channels(channels, connections, salt="connection") if group]
+    for shard_bot in bots:
+        shard_bot.metrics_port = metrics_port
+    print(f"🔌 Starting {len(bots)} connection(s) for {len(channels)} channel(s)")
+    try:
+        loop.run_until_complete(asyncio.gather(*(shard_bot.start() for shard_bot in bots)))
+    except KeyboardInterrupt:
+        pass
+
+def run_sharded(channels, processes, connections):
+    """Spread channels across worker processes by consistent hashing, each running its own connections."""
+    import multiprocessing
+
+    workers = []
+    for index, group in enumerate(shard_channels(channels, processes, salt="process")):
+        if not group:
+            continue
+        # Each process serves its own metrics, on the next port up from BOT_METRICS_PORT
+        metrics_port = BOT_METRICS_PORT + index if BOT_METRICS_PORT else 0
+        worker = multiprocessing.Process(target=run_connections, args=(group, connections, metrics_port), name=f"suzu-bot-{index}")
+        worker.start()
+        workers.append(worker)
+        print(f"🚀 Process {index} serving {len(group)} channel(s): {', '.join(group)}, metrics on port {metrics_port or 'off'}")
+
+    for worker in workers:
+        worker.join()
 
 # Run the bot
 if __name__ == "__main__":
-    bot.run()
\ No newline at end of file
+    if BOT_PROCESSES > 1:
+        run_sharded(TWITCH_CHANNELS, BOT_PROCESSES, BOT_CONNECTIONS)
+    elif BOT_CONNECTIONS > 1:
+        run_connections(TWITCH_CHANNELS, BOT_CONNECTIONS)
+    else:
+        bot.run()
\ No newline at end of file
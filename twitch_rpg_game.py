@@ -1,51 +1,60 @@
-import sqlite3
 import random
 import re
 import twitchio
 import json
+from metrics import timed
+from db_worker import get_db_worker
+from db_connections import get_connection_manager
+from balance_cache import get_balance_cache
+from leaderboard import get_shared_leaderboard
+from narration import get_narration_pool
 
 
 class RPGHandler:
     def __init__(self, db_path):
         self.db_path = db_path
+        self.db = get_connection_manager(db_path)  # Shared, persistent connections with WAL
+        self.db_worker = get_db_worker(db_path)  # The bot runs game calls on this thread, off the event loop
+        self.balances = get_balance_cache(db_path)  # User profiles shared with blackjack, kept in sync on every write
+        self.leaderboard = get_shared_leaderboard(db_path)  # Chip ranking shared with blackjack
+        self.narration = get_narration_pool(db_path)  # Suzu's pre-written announcements, shared with blackjack
         self.active_battle = None  # Track the current battle
         self.initiative_order = []  # Track initiative order (players and monster)
         self.player_actions = {}  # Track player actions
 
+    @timed("db_query_seconds", "SQLite call latency by method")
     def get_user_tokens(self, username):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT chips, level, xp, strength, dexterity, intelligence, vitality, hp, max_hp, inventory FROM users WHERE username = ?", (username,))
-        result = cursor.fetchone()
-        conn.close()
-        if result:
+        profile = self.balances.fetch(self.db.connection(), username)
+        if profile:
             return {
-                "chips": result[0],
-                "level": result[1],
-                "xp": result[2],
-                "strength": result[3],
-                "dexterity": result[4],
-                "intelligence": result[5],  # Fixed indexing
-                "vitality": result[6],      # Fixed indexing
-                "hp": result[7],            # Fixed indexing
-                "max_hp": result[8],        # Fixed indexing
+                "chips": profile["chips"],
+                "level": profile["level"],
+                "xp": profile["xp"],
+                "strength": profile["strength"],
+                "dexterity": profile["dexterity"],
+                "intelligence": profile["intelligence"],
+                "vitality": profile["vitality"],
+                "hp": profile["hp"],
+                "max_hp": profile["max_hp"],
             }
         else:
             return {"chips": 0, "level": 1, "xp": 0}
 
+    @timed("db_query_seconds", "SQLite call latency by method")
     def update_user_tokens(self, username, amount):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.connection()
         cursor = conn.cursor()
         cursor.execute("UPDATE users SET chips = chips + ? WHERE username = ?", (amount, username))
         conn.commit()
-        conn.close()
+        self.balances.invalidate(username)  # Re-read the new balance on next use
+        self.leaderboard.adjust_chips(username, amount)
 
+    @timed("db_query_seconds", "SQLite call latency by method")
     def get_item_info(self, item_name):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.connection()
         cursor = conn.cursor()
         cursor.execute("SELECT cost, effect, level_required FROM items WHERE name = ?", (item_name,))
         result = cursor.fetchone()
-        conn.close()
         if result:
             return {"cost": result[0], "effect": result[1], "level_required": result[2]}
         else:
@@ -77,6 +86,11 @@ class RPGHandler:
 
         return f"{username} bought {quantity} {item_name}(s) for {total_cost} tokens!"
 
+    def announce(self, message, outcome, **values):
+        """Add Suzu's pre-written take on a battle moment to a message, if she has written any yet."""
+        announcement = self.narration.render(outcome, **values)
+        return f"{message}\n{announcement}" if announcement else message
+
     def roll_dice(self, dice_notation):
         match = re.match(r'(\d+)d(\d+)', dice_notation)
         if match:
@@ -87,14 +101,11 @@ class RPGHandler:
         else:
             return 0
 
+    @timed("db_query_seconds", "SQLite call latency by method")
     def get_user_stats(self, username):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT chips, level, xp, hp, max_hp FROM users WHERE username = ?", (username,))
-        result = cursor.fetchone()
-        conn.close()
-        if result:
-            return f"{username}'s Stats: Chips: {result[0]}, Level: {result[1]}, XP: {result[2], cur}, HP: {result[3]}/{result[4]}"
+        profile = self.balances.fetch(self.db.connection(), username)
+        if profile:
+            return f"{username}'s Stats: Chips: {profile['chips']}, Level: {profile['level']}, XP: {profile['xp']}, HP: {profile['hp']}/{profile['max_hp']}"
         else:
             return f"{username} has no stats yet."
 
@@ -113,6 +124,7 @@ class RPGHandler:
         effect = item_info["effect"]
         return f"{username} used {item_name}! Effect: {effect}"
 
+    @timed("db_query_seconds", "SQLite call latency by method")
     def gain_xp(self, username, xp_amount):
         user_data = self.get_user_tokens(username)
         new_xp = user_data["xp"]
@@ -140,11 +152,11 @@ class RPGHandler:
 
         print(f"XP after: {new_xp}, Level after: {new_level}, Chips after: {chips}")
 
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.connection()
         cursor = conn.cursor()
         cursor.execute("UPDATE users SET xp = ?, level = ? WHERE username = ?", (new_xp, new_level, username))
         conn.commit()
-        conn.close()
+        self.balances.update(username, xp=new_xp, level=new_level)
 
         return f"{username} gained {xp_amount} XP and is now level {new_level} with {new_xp} XP."
 
@@ -161,9 +173,10 @@ class RPGHandler:
         dexterity_modifier = self.calculate_modifier(dexterity_score)
         return max(1, random.randint(1, 20) + dexterity_modifier)  # Ensure initiative is at least 1
 
+    @timed("db_query_seconds", "SQLite call latency by method")
     def spawn_monster(self, challenge_rating=None):
         """Spawn a monster from the database."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.connection()
         cursor = conn.cursor()
 
         # Select a monster based on challenge rating or randomly
@@ -173,7 +186,6 @@ class RPGHandler:
             cursor.execute("SELECT * FROM monsters ORDER BY RANDOM() LIMIT 1")
 
         monster = cursor.fetchone()
-        conn.close()
 
         if not monster:
             return None
@@ -226,7 +238,10 @@ class RPGHandler:
         self.initiative_order = [(monster["name"], monster_initiative)]  # Add monster to initiative order
         self.player_actions = {}
 
-        return f"A wild {monster['name']} has appeared with {monster['hp']} HP! Type `~joinbattle` to join the fight!"
+        return self.announce(
+            f"A wild {monster['name']} has appeared with {monster['hp']} HP! Type `~joinbattle` to join the fight!",
+            "rpg_monster_appears", monster=monster["name"]
+        )
 
     def join_battle(self, username):
         """Allow a player to join the battle."""
@@ -266,6 +281,7 @@ class RPGHandler:
         inventory = user_data.get("inventory", [])
         return inventory
 
+    @timed("db_query_seconds", "SQLite call latency by method")
     def add_item_to_inventory(self, username, item_name):
         """Add an item to the user's inventory."""
         user_data = self.get_user_tokens(username)
@@ -368,11 +384,15 @@ class RPGHandler:
             for player in players:
                 self.update_user_tokens(player, tokens)  # Add tokens to each player
             # Return the result of the attack
-            return f"{username} dealt {damage} damage and defeated the {monster_name}! Everyone gains {tokens} tokens!"
+            return self.announce(
+                f"{username} dealt {damage} damage and defeated the {monster_name}! Everyone gains {tokens} tokens!",
+                "rpg_victory", player=username, monster=monster_name, tokens=tokens
+            )
 
         # Return the result of the attack
         return f"{username} dealt {damage} damage! The monster has {self.active_battle['monster_hp']} HP remaining."
 
+    @timed("db_query_seconds", "SQLite call latency by method")
     def monster_attack(self):
         """Handle the monster's attack on a random player."""
         if not self.active_battle:
@@ -398,11 +418,11 @@ class RPGHandler:
         print(f"Next turn: {next_turn}")  # Debug print
 
         # Update the player's HP in the database
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.connection()
         cursor = conn.cursor()
         cursor.execute("UPDATE users SET hp = ? WHERE username = ?", (new_hp, target))
         conn.commit()
-        conn.close()
+        self.balances.update(target, hp=new_hp)
 
         self.update_initiative_order()  # Update initiative order for the next turn 
 
@@ -413,8 +433,12 @@ class RPGHandler:
 
             # If no players are left, end the battle
             if not self.active_battle["players"]:
+                monster_name = self.active_battle["monster"]["name"]
                 self.end_battle()
-                return f"The monster attacked {target} for {damage} damage! {defeat_message} The battle is over. The monster wins!"
+                return self.announce(
+                    f"The monster attacked {target} for {damage} damage! {defeat_message} The battle is over. The monster wins!",
+                    "rpg_defeat", monster=monster_name
+                )
 
             return f"The monster attacked {target} for {damage} damage! {defeat_message}"
 
@@ -447,6 +471,7 @@ class RPGHandler:
         turn_order = ", ".join([f"{entity[0]} (Initiative: {entity[1]})" for entity in self.initiative_order])
         return f"The battle begins! Turn order: {turn_order}"
 
+    @timed("db_query_seconds", "SQLite call latency by method")
     def heal_player(self, username, heal_amount=None):
         """Heal a player by a specified amount or to full health if no amount is given."""
         if not self.active_battle:
@@ -468,17 +493,18 @@ class RPGHandler:
         new_hp = min(current_hp + heal_amount, max_hp)  # Ensure HP doesn't exceed max HP
 
         # Update the player's HP in the database
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.connection()
         cursor = conn.cursor()
         cursor.execute("UPDATE users SET hp = ? WHERE username = ?", (new_hp, username))
         conn.commit()
-        conn.close()
+        self.balances.update(username, hp=new_hp)
 
         return f"{username} has been healed for {heal_amount} HP and now has {new_hp}/{max_hp} HP!"
 
     import json
 
     # Add an item to the user's inventory
+    @timed("db_query_seconds", "SQLite call latency by method")
     def add_item_to_inventory(self, username, item_name, amount=1):
         """Add an item to the user's inventory."""
         user_data = self.get_user_tokens(username)
@@ -492,15 +518,16 @@ class RPGHandler:
 
         # Save the updated inventory back to the database
         inventory_json = json.dumps(inventory)
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.connection()
         cursor = conn.cursor()
         cursor.execute("UPDATE users SET inventory = ? WHERE username = ?", (inventory_json, username))
         conn.commit()
-        conn.close()
+        self.balances.update(username, inventory=inventory_json)
 
         return f"{username} now has {inventory[item_name]} {item_name}(s) in their inventory."
 
     # Remove an item from the user's inventory
+    @timed("db_query_seconds", "SQLite call latency by method")
     def remove_item_from_inventory(self, username, item_name, amount=1):
         """Remove an item from the user's inventory."""
         user_data = self.get_user_tokens(username)
@@ -516,11 +543,11 @@ class RPGHandler:
 
         # Save the updated inventory back to the database
         inventory_json = json.dumps(inventory)
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.connection()
         cursor = conn.cursor()
         cursor.execute("UPDATE users SET inventory = ? WHERE username = ?", (inventory_json, username))
         conn.commit()
-        conn.close()
+        self.balances.update(username, inventory=inventory_json)
 
         return f"{username} now has {inventory.get(item_name, 0)} {item_name}(s) in their inventory."
     